@@ -1,204 +1,674 @@
-"""
-align_to_to_inverted.py
-The script will align selected objects to current Transform Orientation set in the current 3D view.
-It changes object's rotation values, but leaves its orientation intact. It is similar to blender's
-standard 'Align to transform orientation' command, but rotates only transform, not the object data.
-
-see also:  https://blender.stackexchange.com/q/110894/23172,
-
-@author: (c) LIII-LIX A.S. Mechanic.Kharkiv
-@last_edit: 2024-02-29
-
-tested in 2.68, 2.76b, 2.92, 4.0.2;
-"""
-
-bl_info = {
-    "name": "Align to Transform Orientation inverted",
-    "description": "Operator to set objects' rotation as of current transform orientation.",
-    "location": "3D View > Object Mode > Object > Transform menu",
-    "version": (1, 0, 0),
-    "blender": (2, 80, 0),
-    "support": "COMMUNITY",
-    'wiki_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/tree/master/align_to_to_inverted",
-    'doc_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/tree/master/align_to_to_inverted",
-    'tracker_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/issues",
-    "warning": "",
-    "category": "Object",
-    "author" : "(c) LIII-LIX A.S. Mechanic.Kharkiv"
-}
-
-import bpy
-from mathutils import Matrix
-from bpy.props import BoolProperty
-import operator
-if bpy.app.version >= (2, 80, 0):
-    matmul = operator.matmul
-else:
-    matmul = operator.mul
-
-# this was taken from https://github.com/CGCookie/blender-addon-updater
-def make_annotations(cls):
-    """Add annotation attribute to fields to avoid Blender 2.8+ warnings"""
-    if not hasattr(bpy.app, "version") or bpy.app.version < (2, 80):
-        return cls
-    if bpy.app.version < (2, 93, 0):
-        bl_props = {k: v for k, v in cls.__dict__.items()
-                    if isinstance(v, tuple)}
-    else:
-        bl_props = {k: v for k, v in cls.__dict__.items()
-                    if isinstance(v, bpy.props._PropertyDeferred)}
-    if bl_props:
-        if '__annotations__' not in cls.__dict__:
-            setattr(cls, '__annotations__', {})
-        annotations = cls.__dict__['__annotations__']
-        for k, v in bl_props.items():
-            annotations[k] = v
-            delattr(cls, k)
-    return cls
-
-@make_annotations
-class AlignToTOInverted(bpy.types.Operator):
-    """Aligns selected objects' rotation (object's only) to current TO"""
-    bl_idname = "object.align_to_to_inverted"
-    bl_label = "Align to Transform Orientation inverted"
-    bl_options = {'REGISTER', 'UNDO'}
-
-    to_active_object = BoolProperty(
-            name="To active object",
-            description="Use the active object rotation instead of transform orientation",
-            default=False
-        )
-
-    @classmethod
-    def poll(cls, context):
-        return context.active_object is not None
-
-    def execute(self, context):
-
-        # store current context (selection, active object)
-        # find objects to process
-        selection = [obj for obj in context.selected_objects]
-        old_active = context.object
-
-        # find current transform orientation target matrix
-        space = context.space_data
-        region_3d = space.region_3d
-
-        if bpy.app.version < (2, 80, 0):
-            to = space.transform_orientation # GLOBAL, LOCAL, NORMAL, GIMBAL, VIEW
-            custom_to = space.current_orientation
-        else:
-            to = context.scene.transform_orientation_slots[0].type # GLOBAL, LOCAL, NORMAL, GIMBAL, VIEW, CURSOR
-            custom_to = context.scene.transform_orientation_slots[0].custom_orientation
-
-        m_rot_src = None
-        using_active = False
-
-        # is it to_active_object mode?
-        if len(selection) > 1 and self.to_active_object:
-            using_active = True
-            m_rot_src = old_active.matrix_world
-            #self.report({'INFO'}, "Using '%s' object's rotation" % (old_active.name))
-        else:
-            if custom_to is not None:
-                # using custom transform orirntation
-                m_rot_src = custom_to.matrix    # 3x3
-                #print("Using Ttansform Oientation %s" % (custom_to.name))
-            else:
-                # using embedded transform orientation
-                # to == LOCAL doesn't have any sense, as well as others
-                if to in ('LOCAL', 'NORMAL', 'GIMBAL', 'CURSOR'):
-                    self.report({'ERROR'}, "Align to '%s' is not supported" % (to))
-                    return {'CANCELLED'}
-
-                elif to == 'GLOBAL':
-                    m_rot_src = Matrix.Identity(3)   # default global matrix
-
-                elif to == 'VIEW':
-                    # get matrix from viewport
-                    m_rot_src = region_3d.view_rotation.to_matrix()
-
-                else:
-                    self.report({'ERROR'}, "Unknown transform orientatin '%s' is not supported" % (to))
-                    return {'CANCELLED'}
-
-                #self.report({'INFO'}, "Using Ttansform Oientation %s" % (to))
-
-        # transposed (the same as inverted) rotation
-        m_rot_src_i = m_rot_src.to_3x3().transposed()
-
-        # enlarge for multiplication
-        m_rot_src = m_rot_src.to_4x4()
-        m_rot_src_i = m_rot_src_i.to_4x4()
-
-        # apply transformations for each object
-        bpy.ops.object.select_all(action='DESELECT')
-
-        for obj in selection:
-
-            if using_active and obj == old_active:
-                continue
-
-            try:
-                # now we rotate it to revert TO rotation
-                loc = obj.location.copy()
-                obj.matrix_world = matmul(m_rot_src_i, obj.matrix_world)
-
-                # applying this as default rotation
-                if bpy.app.version < (2, 80, 0):
-                    obj.select = True
-                    context.scene.objects.active = obj
-                else:
-                    obj.select_set(state = True)
-                    context.view_layer.objects.active = obj
-                bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
-
-                # and now we rotate it back to TO rotation
-                obj.matrix_world = matmul(m_rot_src, obj.matrix_world)
-                obj.location = loc
-                if bpy.app.version < (2, 80, 0):
-                    obj.select = False
-                else:
-                    obj.select_set(state = False)
-
-            except Exception as e:
-                self.report({'ERROR'}, "Exception %s on %s" % (e, obj.name))
-                continue
-
-        # restore saved context
-        bpy.ops.object.select_all(action='DESELECT')
-        if bpy.app.version < (2, 80, 0):
-            for obj in selection:
-                obj.select = True
-            context.scene.objects.active = old_active
-        else:
-            for obj in selection:
-                obj.select_set(state = True)
-            context.view_layer.objects.active = old_active
-
-        return {'FINISHED'}
-
-
-def menu_func(self, context):
-    self.layout.operator(
-        AlignToTOInverted.bl_idname)
-
-
-def register():
-    bpy.utils.register_class(AlignToTOInverted)
-    bpy.types.VIEW3D_MT_transform_object.append(menu_func)
-
-
-def unregister():
-    bpy.utils.unregister_class(AlignToTOInverted)
-    bpy.types.VIEW3D_MT_transform_object.remove(menu_func)
-
-
-# This allows you to run the script directly from Blender's Text editor
-# to test the add-on without having to install it.
-if __name__ == "__main__":
-    register()
-
-    # test call
-    #bpy.ops.object.align_to_to_inverted()
-
+"""
+align_to_to_inverted.py
+The script will align selected objects to current Transform Orientation set in the current 3D view.
+It changes object's rotation values, but leaves its orientation intact. It is similar to blender's
+standard 'Align to transform orientation' command, but rotates only transform, not the object data.
+
+see also:  https://blender.stackexchange.com/q/110894/23172,
+
+@author: (c) LIII-LIX A.S. Mechanic.Kharkiv
+@last_edit: 2026-10-17
+
+tested in 2.68, 2.76b, 2.92, 4.0.2;
+"""
+
+bl_info = {
+    "name": "Align to Transform Orientation inverted",
+    "description": "Operator to set objects' rotation as of current transform orientation.",
+    "location": "3D View > Object Mode > Object > Transform menu",
+    "version": (1, 6, 0),
+    "blender": (2, 80, 0),
+    "support": "COMMUNITY",
+    'wiki_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/tree/master/align_to_to_inverted",
+    'doc_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/tree/master/align_to_to_inverted",
+    'tracker_url': "https://github.com/mechanic-kharkiv/small-blender-scripts/issues",
+    "warning": "",
+    "category": "Object",
+    "author" : "(c) LIII-LIX A.S. Mechanic.Kharkiv"
+}
+
+import bpy
+from mathutils import Euler, Matrix, Quaternion
+from bpy.props import BoolProperty
+import operator
+if bpy.app.version >= (2, 80, 0):
+    matmul = operator.matmul
+else:
+    matmul = operator.mul
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def get_scale_matrix(scale):
+    "returns 4x4 matrix of the (x, y, z) scale"
+    m_scale = Matrix.Identity(4)
+    for i in range(3):
+        m_scale[i][i] = scale[i]
+    return m_scale
+
+def compose_matrix(loc, m_rot, scale):
+    "returns 4x4 matrix of the location, 3x3 rotation matrix and scale"
+    return matmul(matmul(Matrix.Translation(loc), m_rot.to_4x4()), get_scale_matrix(scale))
+
+def get_alignment(m_world, m_rot):
+    """ returns data correction matrix of the object with the world matrix, which rotation is set to
+    m_rot (3x3), while the object itself stays in place: new world @ correction == old world. """
+    loc, rot, scale = m_world.decompose()
+    return matmul(matmul(get_scale_matrix([1.0 / v if v != 0.0 else 0.0 for v in scale]),
+                         matmul(m_rot.transposed(), rot.to_matrix()).to_4x4()),
+                  get_scale_matrix(scale))
+
+def transform_points(collection, matrix, attr="co", size=3):
+    """ transforms coordinates of all items of the collection by 4x4 matrix in bulk;
+    size 4 is for (x, y, z, w) coordinates, w isn't changed. """
+    n = len(collection)
+    if n == 0:
+        return
+    if np is not None:
+        co = np.empty(n * size, dtype=np.float32)
+        collection.foreach_get(attr, co)
+        co = co.reshape(n, size)
+        m = np.array(matrix, dtype=np.float64)
+        co[:, :3] = np.dot(co[:, :3], m[:3, :3].T) + m[:3, 3]
+        collection.foreach_set(attr, co.ravel())
+    elif size == 3:
+        for item in collection:
+            setattr(item, attr, matmul(matrix, getattr(item, attr)))
+    else:
+        for item in collection:
+            co = getattr(item, attr)
+            x, y, z = matmul(matrix, co.to_3d())
+            setattr(item, attr, (x, y, z, co[3]))
+
+def transform_mesh(mesh, matrix):
+    "transforms mesh vertices and shape keys by 4x4 matrix"
+    if np is None or getattr(mesh, "has_custom_normals", False):
+        # the native one takes care of the custom normals
+        try:
+            mesh.transform(matrix, shape_keys=True)
+            mesh.update()
+            return
+        except TypeError:
+            # no shape_keys argument yet
+            mesh.transform(matrix)
+    else:
+        transform_points(mesh.vertices, matrix)
+    if mesh.shape_keys:
+        for key_block in mesh.shape_keys.key_blocks:
+            transform_points(key_block.data, matrix)
+    mesh.update()
+
+def transform_curve(curve, matrix):
+    "transforms curve (or surface) control points and handles by 4x4 matrix"
+    for spline in curve.splines:
+        if spline.type == 'BEZIER':
+            for attr in ("co", "handle_left", "handle_right"):
+                transform_points(spline.bezier_points, matrix, attr)
+        else:
+            transform_points(spline.points, matrix, "co", 4)
+    if curve.shape_keys:
+        # bezier and other points may be mixed here, so one by one
+        for key_block in curve.shape_keys.key_blocks:
+            for point in key_block.data:
+                for attr in ("co", "handle_left", "handle_right"):
+                    if hasattr(point, attr):
+                        setattr(point, attr, matmul(matrix, getattr(point, attr)))
+
+def transform_lattice(lattice, matrix):
+    "transforms lattice points and shape keys by 4x4 matrix"
+    transform_points(lattice.points, matrix, "co_deform")
+    if lattice.shape_keys:
+        for key_block in lattice.shape_keys.key_blocks:
+            transform_points(key_block.data, matrix)
+
+def transform_data(data, matrix):
+    "transforms the object data by 4x4 matrix"
+    if isinstance(data, bpy.types.Mesh):
+        transform_mesh(data, matrix)
+    elif isinstance(data, bpy.types.Armature):
+        # it takes care of the rolls
+        data.transform(matrix)
+    elif isinstance(data, bpy.types.Curve):
+        transform_curve(data, matrix)
+    elif isinstance(data, bpy.types.Lattice):
+        transform_lattice(data, matrix)
+    data.update_tag()
+
+def compensate_children(obj, m_data):
+    "keeps children of the object in place, when its data is transformed by m_data"
+    for child in obj.children:
+        # bone and vertex parents move together with the data
+        if child.parent_type not in ('BONE', 'VERTEX', 'VERTEX_3'):
+            child.matrix_parent_inverse = matmul(m_data, child.matrix_parent_inverse)
+
+def set_matrix_basis(obj, matrix):
+    "sets the object's basis matrix, keeping its location values as they are (they don't change anyway)"
+    loc = obj.location.copy()
+    obj.matrix_basis = matrix
+    obj.location = loc
+
+# parent types, where the parent matrix is just the parent object's world matrix
+OBJECT_PARENT_TYPES = ('OBJECT', 'ARMATURE', 'LATTICE')
+
+def get_world_matrices(objects, worlds=None):
+    """ returns dict {object : world matrix} of the objects (and their parents), computed from the parent
+    chains, each object once. Objects with constraints, or with bone, vertex and path parents
+    take the evaluated matrix_world. worlds - dict to add the matrices to. """
+    if worlds is None:
+        worlds = {}
+    for obj in objects:
+        # up to the first known, or independent one
+        chain = []
+        while obj not in worlds:
+            chain.append(obj)
+            if obj.parent is None or obj.constraints or obj.parent_type not in OBJECT_PARENT_TYPES:
+                break
+            obj = obj.parent
+        for obj in reversed(chain):
+            if obj.constraints or obj.parent is not None and obj.parent_type not in OBJECT_PARENT_TYPES:
+                worlds[obj] = obj.matrix_world.copy()
+            elif obj.parent is None:
+                worlds[obj] = obj.matrix_basis.copy()
+            else:
+                worlds[obj] = matmul(matmul(worlds[obj.parent], obj.matrix_parent_inverse), obj.matrix_basis)
+    return worlds
+
+def is_sheared(matrix):
+    "returns True if the 4x4 matrix can't be represented by location, rotation and scale"
+    loc, rot, scale = matrix.decompose()
+    return matrices_differ(compose_matrix(loc, rot.to_matrix(), scale), matrix)
+
+def can_align_directly(obj):
+    "returns True if the object data can be rotated without the operators"
+    if obj.type == 'EMPTY':
+        # nothing to rotate, its display just follows the rotation
+        return True
+    if obj.type == 'ARMATURE':
+        # there is no Armature.transform() in old versions
+        return hasattr(obj.data, "transform") and obj.data.library is None and obj.mode == 'OBJECT'
+    return obj.type in ('MESH', 'CURVE', 'SURFACE', 'LATTICE') and obj.data.library is None
+
+def get_parent_depth(obj):
+    depth = 0
+    while obj.parent:
+        obj = obj.parent
+        depth += 1
+    return depth
+
+def matrices_differ(m1, m2, tolerance=1e-5):
+    "returns True if any element of the matrices differs more than the tolerance"
+    return any(abs(a - b) > tolerance for r1, r2 in zip(m1, m2) for a, b in zip(r1, r2))
+
+def get_data_users():
+    "returns dict {data : list of objects using it}"
+    res = {}
+    for obj in bpy.data.objects:
+        if obj.data is not None:
+            res.setdefault(obj.data, []).append(obj)
+    return res
+
+# rotation channel of each rotation mode, and its size
+ROTATION_CHANNELS = {
+    'QUATERNION' : ("rotation_quaternion", 4),
+    'AXIS_ANGLE' : ("rotation_axis_angle", 4),
+}
+EULER_CHANNEL = ("rotation_euler", 3)
+
+def print_report(type, message):
+    print("%s: %s" % (", ".join(sorted(type)), message))
+
+def quaternions_multiply(a, b):
+    "returns (N, 4) array of products of (N, 4) and (4,) or (N, 4) arrays of (w, x, y, z) quaternions"
+    a0, a1, a2, a3 = a.T
+    b0, b1, b2, b3 = np.asarray(b).T
+    return np.stack((a0 * b0 - a1 * b1 - a2 * b2 - a3 * b3,
+                     a0 * b1 + a1 * b0 + a2 * b3 - a3 * b2,
+                     a0 * b2 - a1 * b3 + a2 * b0 + a3 * b1,
+                     a0 * b3 + a1 * b2 - a2 * b1 + a3 * b0), axis=1)
+
+def axis_angles_to_quaternions(values):
+    "returns (N, 4) array of quaternions of (N, 4) array of (angle, x, y, z) axis angles"
+    axis = values[:, 1:]
+    length = np.linalg.norm(axis, axis=1)
+    half = values[:, 0] / 2.0
+    scale = np.where(length > 0.0, np.sin(half) / np.where(length > 0.0, length, 1.0), 0.0)
+    return np.column_stack((np.where(length > 0.0, np.cos(half), 1.0), axis * scale[:, None]))
+
+def quaternions_to_axis_angles(quats):
+    "returns (N, 4) array of (angle, x, y, z) axis angles of (N, 4) array of quaternions"
+    length = np.linalg.norm(quats[:, 1:], axis=1)
+    angle = 2.0 * np.arctan2(length, quats[:, 0])
+    axis = np.where(length[:, None] > 0.0, quats[:, 1:] / np.where(length > 0.0, length, 1.0)[:, None],
+                    np.array([0.0, 1.0, 0.0]))
+    return np.column_stack((angle, axis))
+
+def eulers_to_quaternions(values, order):
+    "returns (N, 4) array of quaternions of (N, 3) array of eulers of the order ('XYZ', ...)"
+    res = None
+    for axis in order:
+        i = "XYZ".index(axis)
+        q = np.zeros((len(values), 4))
+        q[:, 0] = np.cos(values[:, i] / 2.0)
+        q[:, i + 1] = np.sin(values[:, i] / 2.0)
+        # the first axis rotates first
+        res = q if res is None else quaternions_multiply(q, res)
+    return res
+
+def get_rotation_fcurves(obj):
+    "returns (data path, size, list of fcurves or None of each component) of the object's keyed rotation"
+    data_path, size = ROTATION_CHANNELS.get(obj.rotation_mode, EULER_CHANNEL)
+    fcurves = [None] * size
+    action = obj.animation_data.action if obj.animation_data else None
+    if action:
+        for fc in action.fcurves:
+            if fc.data_path == data_path and fc.array_index < size:
+                fcurves[fc.array_index] = fc
+    return data_path, size, fcurves
+
+def get_rotation_state(obj):
+    "returns the object's basis rotation matrix and rotation values, for rotate_rotation_animation()"
+    data_path, size, fcurves = get_rotation_fcurves(obj)
+    if not any(fcurves):
+        return None
+    return obj.matrix_basis.decompose()[1].to_matrix(), tuple(getattr(obj, data_path))
+
+def rotate_rotation_animation(obj, state, report):
+    """ re-expresses the object's keyed rotation R(t) as R(t) @ C, where C turns the basis rotation
+    before the alignment (state from get_rotation_state()) into the current one. """
+    if state is None:
+        return
+    m_rot_old, static_values = state
+    m_corr = matmul(m_rot_old.transposed(), obj.matrix_basis.decompose()[1].to_matrix())
+    if not matrices_differ(m_corr, Matrix.Identity(3)):
+        return
+    action = obj.animation_data.action
+    if action.users - int(action.use_fake_user) > 1:
+        report({'WARNING'}, "Action '%s' of '%s' is shared, its rotation isn't changed" % (action.name, obj.name))
+        return
+    if np is None:
+        report({'WARNING'}, "No numpy, rotation animation of '%s' isn't changed" % (obj.name))
+        return
+
+    data_path, size, fcurves = get_rotation_fcurves(obj)
+
+    # all the keys of all the components at once
+    keys = []
+    for fc in fcurves:
+        co = None
+        if fc is not None:
+            co = np.empty(len(fc.keyframe_points) * 2, dtype=np.float32)
+            fc.keyframe_points.foreach_get("co", co)
+            co = co.reshape(-1, 2)
+        keys.append(co)
+    frames = np.unique(np.concatenate([co[:, 0] for co in keys if co is not None]))
+    values = np.empty((len(frames), size))
+    for i, (fc, co) in enumerate(zip(fcurves, keys)):
+        if fc is None:
+            values[:, i] = static_values[i]
+        elif len(co) == len(frames) and (co[:, 0] == frames).all():
+            values[:, i] = co[:, 1]
+        else:
+            values[:, i] = [fc.evaluate(frame) for frame in frames]
+
+    # R(t) @ C
+    q_corr = np.array(m_corr.to_quaternion())
+    if obj.rotation_mode == 'QUATERNION':
+        # the product is linear, so the keys interpolate to the same rotations as before (no sign flips,
+        # they would change the keys which deliberately go the long way)
+        new_values = quaternions_multiply(values, q_corr)
+    elif obj.rotation_mode == 'AXIS_ANGLE':
+        new_values = quaternions_to_axis_angles(quaternions_multiply(axis_angles_to_quaternions(values), q_corr))
+    else:
+        quats = quaternions_multiply(eulers_to_quaternions(values, obj.rotation_mode), q_corr)
+        # compatible eulers, without flips between the keys
+        new_values = np.empty_like(values)
+        compat = Euler(values[0], obj.rotation_mode)
+        for i, q in enumerate(quats):
+            compat = Quaternion(q).to_euler(obj.rotation_mode, compat)
+            new_values[i] = compat
+
+    # the components keyed at all the frames keep their keys
+    same_keys = [fc is not None and len(co) == len(frames) and (co[:, 0] == frames).all()
+                 for fc, co in zip(fcurves, keys)]
+    handles = [{} for fc in fcurves]
+    for i, fc in enumerate(fcurves):
+        if same_keys[i]:
+            for attr in ("handle_left", "handle_right"):
+                h = np.empty(len(frames) * 2, dtype=np.float32)
+                fc.keyframe_points.foreach_get(attr, h)
+                handles[i][attr] = h.reshape(-1, 2)
+    if obj.rotation_mode == 'QUATERNION' and all(same_keys):
+        # the handles are transformed by the same (linear) product as the keys
+        for attr in ("handle_left", "handle_right"):
+            h_values = quaternions_multiply(np.column_stack([h[attr][:, 1] for h in handles]), q_corr)
+            for i, h in enumerate(handles):
+                h[attr][:, 1] = h_values[:, i]
+    else:
+        # eulers and axis angles aren't linear in the rotation: the handles are moved along with their
+        # keys, which is only an approximation between the keys
+        for i, h in enumerate(handles):
+            for attr in h:
+                h[attr][:, 1] += (new_values[:, i] - keys[i][:, 1]).astype(np.float32)
+
+    # write them back
+    group_name = next((fc.group.name for fc in fcurves if fc is not None and fc.group), "Object Transforms")
+    for i, (fc, co) in enumerate(zip(fcurves, keys)):
+        if same_keys[i]:
+            co[:, 1] = new_values[:, i]
+            fc.keyframe_points.foreach_set("co", co.ravel())
+            for attr, h in handles[i].items():
+                fc.keyframe_points.foreach_set(attr, h.ravel())
+        else:
+            if fc is None:
+                fc = obj.animation_data.action.fcurves.new(data_path, index=i, action_group=group_name)
+            for frame, value in zip(frames, new_values[:, i]):
+                fc.keyframe_points.insert(frame, value, options={'FAST'})
+        fc.update()
+
+def align_objects(objects, m_rot, keep=None, animation=False, report=print_report):
+    """ aligns rotation of the objects (which can_align_directly()) to m_rot (3x3) rotating their data.
+    Shared data is transformed once, and all its users (selected or not) are compensated, so they
+    stay in place. keep - object which must not change (the active one in 'to active object' mode).
+    animation - re-express the keyed rotation in the new basis too.
+    Nothing is evaluated on the way: the world matrices are computed once, and each object gets
+    its basis matrix (basis @ correction^-1) and its children's parent inverse (correction @ parent
+    inverse) in one sweep over the hierarchy.
+    Returns list of (data, names of the selected users, reason) which were skipped, because the users
+    can't share one correction, or it can't be inverted (zero scale). """
+    # parents go first
+    objects = sorted(objects, key=get_parent_depth)
+    worlds = get_world_matrices(objects)
+
+    # group the objects by data (empties go on their own)
+    groups = {}
+    order = []
+    for obj in objects:
+        key = obj.data if obj.data is not None else obj
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(obj)
+    data_users = None
+
+    skipped = []
+    new_bases = {}      # object : (new basis matrix, data correction)
+    corrections = []    # (data, data correction)
+    for data in order:
+        group = groups[data]
+        m_data = None
+        users = list(group)
+        ok = True
+        reason = None
+        for obj in group:
+            m_obj_data = get_alignment(worlds[obj], m_rot)
+            if abs(m_obj_data.determinant()) < 1e-12:
+                # flattened, the data can't be restored from it
+                ok = False
+                reason = "zero scale of '%s'" % (obj.name)
+                break
+            if m_data is None:
+                m_data = m_obj_data
+            elif matrices_differ(m_obj_data, m_data):
+                ok = False
+                reason = "its users need different corrections"
+                break
+
+        has_data = group[0].data is not None
+        if ok and has_data and data.users > len(group):
+            # the other users keep their places with the same correction
+            if data_users is None:
+                data_users = get_data_users()
+            for obj in data_users.get(data, ()):
+                if obj in group:
+                    continue
+                if obj == keep:
+                    # it can't change, so the data can't either
+                    if matrices_differ(m_data, Matrix.Identity(4)):
+                        ok = False
+                        reason = "it's shared with the active object"
+                        break
+                    continue
+                users.append(obj)
+
+        entries = {}
+        if ok:
+            m_data_i = m_data.inverted()
+            for obj in users:
+                m_basis = matmul(obj.matrix_basis, m_data_i)
+                if is_sheared(m_basis):
+                    # the correction would shear it
+                    ok = False
+                    reason = "'%s' would be sheared" % (obj.name)
+                    break
+                entries[obj] = (m_basis, m_data)
+
+        if not ok:
+            skipped.append((data, [obj.name for obj in group], reason))
+            continue
+        if has_data:
+            corrections.append((data, m_data))
+        new_bases.update(entries)
+
+    for data, m_data in corrections:
+        transform_data(data, m_data)
+
+    # the parents' world matrices don't change for the children (parent world @ parent inverse
+    # stays the same), so it's one sweep in any order; the hierarchy one is just predictable
+    for obj in sorted(new_bases, key=get_parent_depth):
+        m_basis, m_data = new_bases[obj]
+        state = get_rotation_state(obj) if animation else None
+        compensate_children(obj, m_data)
+        set_matrix_basis(obj, m_basis)
+        rotate_rotation_animation(obj, state, report)
+    return skipped
+
+def align_objects_with_ops(context, objects, m_rot_src, animation=False, report=print_report):
+    """ aligns rotation of the objects to m_rot_src (3x3) applying rotation with the operator
+    (slow, changes selection on the way, but restores it at the end). """
+    selection = list(context.selected_objects)
+    old_active = context.object
+
+    # transposed (the same as inverted) rotation
+    m_rot_src_i = m_rot_src.to_3x3().transposed()
+
+    # enlarge for multiplication
+    m_rot_src = m_rot_src.to_4x4()
+    m_rot_src_i = m_rot_src_i.to_4x4()
+
+    # apply transformations for each object
+    bpy.ops.object.select_all(action='DESELECT')
+
+    for obj in objects:
+
+        try:
+            # now we rotate it to revert TO rotation
+            state = get_rotation_state(obj) if animation else None
+            loc = obj.location.copy()
+            obj.matrix_world = matmul(m_rot_src_i, obj.matrix_world)
+
+            # applying this as default rotation
+            if bpy.app.version < (2, 80, 0):
+                obj.select = True
+                context.scene.objects.active = obj
+            else:
+                obj.select_set(state = True)
+                context.view_layer.objects.active = obj
+            bpy.ops.object.transform_apply(location=False, rotation=True, scale=False)
+
+            # and now we rotate it back to TO rotation
+            obj.matrix_world = matmul(m_rot_src, obj.matrix_world)
+            obj.location = loc
+            rotate_rotation_animation(obj, state, report)
+            if bpy.app.version < (2, 80, 0):
+                obj.select = False
+            else:
+                obj.select_set(state = False)
+
+        except Exception as e:
+            report({'ERROR'}, "Exception %s on %s" % (e, obj.name))
+            continue
+
+    # restore saved context
+    bpy.ops.object.select_all(action='DESELECT')
+    if bpy.app.version < (2, 80, 0):
+        for obj in selection:
+            obj.select = True
+        context.scene.objects.active = old_active
+    else:
+        for obj in selection:
+            obj.select_set(state = True)
+        context.view_layer.objects.active = old_active
+
+def align(context, objects, m_rot, keep=None, animation=False, report=print_report, use_ops=False):
+    """ aligns rotation of the objects to m_rot (3x3) keeping them in place: directly where possible,
+    with the operator otherwise (or always, if use_ops). keep - object which must not change.
+    animation - re-express the keyed rotation in the new basis too.
+    report - function(type set, message) for the warnings and errors. """
+    direct_objects, ops_objects = [], []
+    for obj in objects:
+        if obj == keep:
+            continue
+        if can_align_directly(obj) and not use_ops:
+            direct_objects.append(obj)
+        else:
+            ops_objects.append(obj)
+
+    skipped = align_objects(direct_objects, m_rot, keep, animation, report)
+    for data, names, reason in skipped:
+        report({'WARNING'}, "'%s' can't be aligned keeping %s in place (%s), skipped"
+               % (data.name, ", ".join(sorted(names)), reason))
+
+    # one update for all of them (the operators need the updated matrices too)
+    if bpy.app.version < (2, 80, 0):
+        context.scene.update()
+    else:
+        context.view_layer.update()
+
+    if ops_objects:
+        align_objects_with_ops(context, ops_objects, m_rot, animation, report)
+
+# this was taken from https://github.com/CGCookie/blender-addon-updater
+def make_annotations(cls):
+    """Add annotation attribute to fields to avoid Blender 2.8+ warnings"""
+    if not hasattr(bpy.app, "version") or bpy.app.version < (2, 80):
+        return cls
+    if bpy.app.version < (2, 93, 0):
+        bl_props = {k: v for k, v in cls.__dict__.items()
+                    if isinstance(v, tuple)}
+    else:
+        bl_props = {k: v for k, v in cls.__dict__.items()
+                    if isinstance(v, bpy.props._PropertyDeferred)}
+    if bl_props:
+        if '__annotations__' not in cls.__dict__:
+            setattr(cls, '__annotations__', {})
+        annotations = cls.__dict__['__annotations__']
+        for k, v in bl_props.items():
+            annotations[k] = v
+            delattr(cls, k)
+    return cls
+
+@make_annotations
+class AlignToTOInverted(bpy.types.Operator):
+    """Aligns selected objects' rotation (object's only) to current TO"""
+    bl_idname = "object.align_to_to_inverted"
+    bl_label = "Align to Transform Orientation inverted"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    to_active_object = BoolProperty(
+            name="To active object",
+            description="Use the active object rotation instead of transform orientation",
+            default=False
+        )
+
+    rotate_animation = BoolProperty(
+            name="Rotate animation",
+            description="Re-express keyed object rotation in the new orientation, so it doesn't snap back (needs numpy)",
+            default=False
+        )
+
+    @classmethod
+    def poll(cls, context):
+        return context.active_object is not None
+
+    def execute(self, context):
+
+        # find objects to process
+        selection = [obj for obj in context.selected_objects]
+        old_active = context.object
+
+        # find current transform orientation target matrix
+        space = context.space_data
+        region_3d = space.region_3d
+
+        if bpy.app.version < (2, 80, 0):
+            to = space.transform_orientation # GLOBAL, LOCAL, NORMAL, GIMBAL, VIEW
+            custom_to = space.current_orientation
+        else:
+            to = context.scene.transform_orientation_slots[0].type # GLOBAL, LOCAL, NORMAL, GIMBAL, VIEW, CURSOR
+            custom_to = context.scene.transform_orientation_slots[0].custom_orientation
+
+        m_rot_src = None
+        using_active = False
+
+        # is it to_active_object mode?
+        if len(selection) > 1 and self.to_active_object:
+            using_active = True
+            m_rot_src = old_active.matrix_world.to_3x3().normalized()
+            #self.report({'INFO'}, "Using '%s' object's rotation" % (old_active.name))
+        else:
+            if custom_to is not None:
+                # using custom transform orirntation
+                m_rot_src = custom_to.matrix    # 3x3
+                #print("Using Ttansform Oientation %s" % (custom_to.name))
+            else:
+                # using embedded transform orientation
+                # to == LOCAL doesn't have any sense, as well as others
+                if to in ('LOCAL', 'NORMAL', 'GIMBAL', 'CURSOR'):
+                    self.report({'ERROR'}, "Align to '%s' is not supported" % (to))
+                    return {'CANCELLED'}
+
+                elif to == 'GLOBAL':
+                    m_rot_src = Matrix.Identity(3)   # default global matrix
+
+                elif to == 'VIEW':
+                    # get matrix from viewport
+                    m_rot_src = region_3d.view_rotation.to_matrix()
+
+                else:
+                    self.report({'ERROR'}, "Unknown transform orientatin '%s' is not supported" % (to))
+                    return {'CANCELLED'}
+
+                #self.report({'INFO'}, "Using Ttansform Oientation %s" % (to))
+
+        align(context, selection, m_rot_src.to_3x3(), keep=old_active if using_active else None,
+              animation=self.rotate_animation, report=self.report)
+
+        return {'FINISHED'}
+
+
+def menu_func(self, context):
+    self.layout.operator(
+        AlignToTOInverted.bl_idname)
+
+
+def register():
+    bpy.utils.register_class(AlignToTOInverted)
+    bpy.types.VIEW3D_MT_transform_object.append(menu_func)
+
+
+def unregister():
+    bpy.utils.unregister_class(AlignToTOInverted)
+    bpy.types.VIEW3D_MT_transform_object.remove(menu_func)
+
+
+# This allows you to run the script directly from Blender's Text editor
+# to test the add-on without having to install it.
+if __name__ == "__main__":
+    register()
+
+    # test call
+    #bpy.ops.object.align_to_to_inverted()
+
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of align_to_to_inverted.py on synthetic scenes.
+
+usage:
+    blender -b --factory-startup --python benchmark_align_to_to_inverted.py -- [--objects N [N ...]]
+        [--vertices N [N ...]] [--modes MODE [MODE ...]] [--methods METHOD [METHOD ...]] [--shared]
+        [--repeat N] [--in-process] [--output PATH]
+
+For each combination of the object count and the vertex count, it builds a scene of randomly
+placed and rotated mesh objects (each with its own mesh, or all sharing one with --shared), and
+times the alignment to each orientation mode (GLOBAL, VIEW, CUSTOM, ACTIVE - the active object
+rotation) by each method (direct - the data is rotated in bulk, ops - the 'Apply Rotation'
+operator per object). It prints the results as a json line (and writes them to --output if given):
+the time, the time per object, and the process peak memory (maxrss, where it's available).
+The peak memory is of the whole process, so each combination (of objects, vertices, mode and method)
+is run in its own background blender, unless --in-process is given.
+
+@author: (c) LIII-LIX A.S. Mechanic.Kharkiv
+@last_edit: 2026-10-17
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import bpy
+import numpy as np
+from mathutils import Euler, Matrix
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import align_to_to_inverted as ati
+
+try:
+    import resource
+except ImportError:
+    # windows
+    resource = None
+
+MODES = ("GLOBAL", "VIEW", "CUSTOM", "ACTIVE")
+METHODS = ("direct", "ops")
+
+# the results of a child process are the lines starting with it
+RESULT_PREFIX = "ALIGN_BENCHMARK_RESULT "
+
+
+def get_peak_memory():
+    "returns peak memory of the process in kB, or None"
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # it's in bytes on mac, and in kB on linux
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+def link_object(obj):
+    if bpy.app.version < (2, 80, 0):
+        bpy.context.scene.objects.link(obj)
+    else:
+        bpy.context.scene.collection.objects.link(obj)
+
+def set_active(obj):
+    if bpy.app.version < (2, 80, 0):
+        bpy.context.scene.objects.active = obj
+    else:
+        bpy.context.view_layer.objects.active = obj
+
+def make_mesh(n_vertices, rnd):
+    "returns mesh of n_vertices random vertices"
+    mesh = bpy.data.meshes.new("bench_mesh")
+    mesh.vertices.add(n_vertices)
+    mesh.vertices.foreach_set("co", rnd.uniform(-1.0, 1.0, n_vertices * 3).astype(np.float32))
+    mesh.update()
+    return mesh
+
+def make_scene(n_objects, n_vertices, shared, rnd):
+    "returns list of randomly placed and rotated objects"
+    objects = []
+    mesh = make_mesh(n_vertices, rnd) if shared else None
+    for i in range(n_objects):
+        obj = bpy.data.objects.new("bench_object_{:05d}".format(i), mesh or make_mesh(n_vertices, rnd))
+        link_object(obj)
+        obj.location = rnd.uniform(-100.0, 100.0, 3)
+        # all sharing objects need the same correction
+        obj.rotation_euler = (0.1, 0.2, 0.3) if shared else rnd.uniform(-np.pi, np.pi, 3)
+        objects.append(obj)
+    if bpy.app.version < (2, 80, 0):
+        bpy.context.scene.update()
+    else:
+        bpy.context.view_layer.update()
+    return objects
+
+def clear_scene(objects):
+    meshes = {obj.data for obj in objects}
+    for obj in objects:
+        bpy.data.objects.remove(obj)
+    for mesh in meshes:
+        bpy.data.meshes.remove(mesh)
+
+def get_mode_rotation(mode, objects):
+    "returns (3x3 rotation matrix, object to keep) of the orientation mode, as the operator gets it"
+    if mode == "GLOBAL":
+        return Matrix.Identity(3), None
+    elif mode == "VIEW":
+        # region_3d.view_rotation of some view
+        return Euler((1.1, 0.0, 0.8)).to_quaternion().to_matrix(), None
+    elif mode == "CUSTOM":
+        return Euler((0.3, -0.2, 0.5)).to_matrix(), None
+    else:
+        active = objects[0]
+        set_active(active)
+        return active.matrix_world.to_3x3().normalized(), active
+
+def run(args):
+    results = []
+    rnd = np.random.RandomState(args.seed)
+    for n_objects in args.objects:
+        for n_vertices in args.vertices:
+            for mode in args.modes:
+                for method in args.methods:
+                    for repeat in range(args.repeat):
+                        objects = make_scene(n_objects, n_vertices, args.shared, rnd)
+                        m_rot, keep = get_mode_rotation(mode, objects)
+                        memory_before = get_peak_memory()
+                        _t = time.perf_counter()
+                        ati.align(bpy.context, objects, m_rot, keep=keep, use_ops=(method == "ops"))
+                        if bpy.app.version < (2, 80, 0):
+                            bpy.context.scene.update()
+                        else:
+                            bpy.context.view_layer.update()
+                        align_time = time.perf_counter() - _t
+                        memory_after = get_peak_memory()
+                        clear_scene(objects)
+
+                        results.append({
+                            "objects" : n_objects,
+                            "vertices" : n_vertices,
+                            "mode" : mode,
+                            "method" : method,
+                            "repeat" : repeat,
+                            "align_time" : align_time,
+                            "time_per_object" : align_time / n_objects if n_objects else None,
+                            "peak_memory_kb" : memory_after,
+                            "peak_memory_growth_kb" : (memory_after - memory_before) if memory_after is not None else None,
+                            })
+                        print(RESULT_PREFIX + json.dumps(results[-1]), flush=True)
+    return results
+
+def run_isolated(args):
+    "runs each combination in its own background blender, so the peak memory is of that combination only"
+    results = []
+    for n_objects in args.objects:
+        for n_vertices in args.vertices:
+            for mode in args.modes:
+                for method in args.methods:
+                    cmd = [bpy.app.binary_path, "-b", "--factory-startup", "--python", os.path.abspath(__file__),
+                           "--", "--in-process", "--objects", str(n_objects), "--vertices", str(n_vertices),
+                           "--modes", mode, "--methods", method, "--repeat", str(args.repeat),
+                           "--seed", str(args.seed)]
+                    if args.shared:
+                        cmd.append("--shared")
+                    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                            universal_newlines=True)
+                    out, err = proc.communicate()
+                    lines = [line[len(RESULT_PREFIX):] for line in out.splitlines() if line.startswith(RESULT_PREFIX)]
+                    if lines:
+                        for line in lines:
+                            results.append(json.loads(line))
+                            print(line, flush=True)
+                    else:
+                        # it crashed, or the script failed before any result
+                        results.append({
+                            "objects" : n_objects,
+                            "vertices" : n_vertices,
+                            "mode" : mode,
+                            "method" : method,
+                            "returncode" : proc.returncode,
+                            "error" : (err or out).strip().splitlines()[-10:],
+                            })
+                        print(json.dumps(results[-1]), flush=True)
+    return results
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="blender -b --factory-startup --python benchmark_align_to_to_inverted.py --",
+        description="Times align_to_to_inverted on synthetic scenes.")
+    parser.add_argument("--objects", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="Numbers of objects (default 100 1000 10000).")
+    parser.add_argument("--vertices", type=int, nargs="+", default=[8, 1000],
+                        help="Numbers of vertices per object (default 8 1000).")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES),
+                        help="Orientation modes (default all).")
+    parser.add_argument("--methods", nargs="+", choices=METHODS, default=list(METHODS),
+                        help="Alignment methods (default all).")
+    parser.add_argument("--shared", action="store_true", help="All objects share one mesh.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each combination (default 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0).")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Run all combinations in this process; the peak memory is then of all the runs so far.")
+    parser.add_argument("--output", help="Write the results to this json file.")
+    args = parser.parse_args(argv)
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    res = {
+        "blender" : bpy.app.version_string,
+        "align_version" : ati.bl_info["version"],
+        "numpy" : ati.np is not None,
+        "config" : {name : getattr(args, name) for name in ("objects", "vertices", "modes", "methods",
+                    "shared", "repeat", "seed", "in_process")},
+        "results" : run(args) if args.in_process else run_isolated(args),
+        }
+    print(json.dumps(res))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []))
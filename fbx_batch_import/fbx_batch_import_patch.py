@@ -3,7 +3,7 @@
 This patches standard fbx importer in memory to allow it to import multiple selected fbx files into
 the current scene from the given directory.
 Optionally each imported object receives a property 'fbxpath' with the original source file full path.
-It tags objects, armature and mesh data blocks, and actions.
+It tags objects, armature and mesh data blocks, actions, materials and images.
 
 The embedded 'io_scene_fbx' since 4.20.2 (blender 2.81.6) (?) already supports multiple files,
 but with no tag adding. So, let it be. :-)
@@ -11,7 +11,7 @@ but with no tag adding. So, let it be. :-)
 Created on Jan 28, 2024
 
 @author: (c) LIX A.S. Mechanic.Kharkiv
-@last_edit: 2024-05-07
+@last_edit: 2026-10-17
 '''
 # DONE: sort out the version tag usage to keep it compatible with 2.7x and newer
 #   we just use 2.80: older complain, but allow it; the newer just accept.
@@ -21,7 +21,7 @@ Created on Jan 28, 2024
 bl_info = {
     "name": "FBX format batch import patch",
     "author": "(c) LIX A.S. Mechanic.Kharkiv",
-    "version": (2, 1, 1),
+    "version": (2, 4, 0),
     "blender": (2, 80, 0),
     "location": "File > Import > FBX (.fbx)",
     "description": "Patches standard fbx importer to handle multiple files and tag the imported stuff.",
@@ -143,6 +143,7 @@ patch_lines = {
         layout.prop(self, 'add_tags')
         layout.prop(self, 'action_fake_user')
         layout.prop(self, 'action_filter_names')
+        layout.prop(self, 'parse_jobs')
         layout.prop(self, 'verbose')
     """,
 
@@ -168,19 +169,166 @@ patch_lines = {
 
     "prop0" : 'verbose = BoolProperty(name="Verbose", default=False, description="Verbose console output")\n',
 
-    "dummy" : """
+    "prop4" : """
+        parse_jobs = bpy.props.IntProperty(name="Parse Processes", default=0, min=0, max=64,
+            description="Parse the next files in this many worker processes while the current one is imported (0 - one by one)")
+
+        """,
+
+    "dummy" : r"""
         class DummyFile(object):
             def write(self, x): pass
 
+        class DataSnapshot(object):
+            "keys of the existing data blocks by type, to find the new ones after each import"
+            COLLECTIONS = ("objects", "meshes", "armatures", "actions", "materials", "images")
+
+            def __init__(self):
+                try:
+                    import numpy
+                except ImportError:
+                    numpy = None
+                self.np = numpy
+                self.keys = {}
+                self.counts = {}
+                for name in self.COLLECTIONS:
+                    collection = getattr(bpy.data, name)
+                    keys = self.get_keys(collection)
+                    # a sorted array, to look the keys up in bulk, or a set
+                    self.keys[name] = numpy.unique(numpy.array(keys, dtype=numpy.uint64)) if numpy else set(keys)
+                    self.counts[name] = len(keys)
+
+            @staticmethod
+            def get_keys(collection):
+                "returns list of the collection items' session uids (pointers in old versions)"
+                keys = [0] * len(collection)
+                try:
+                    # 2.91+, in one call
+                    collection.foreach_get("session_uid", keys)
+                except (AttributeError, TypeError, RuntimeError):
+                    keys = [item.as_pointer() for item in collection]
+                return keys
+
+            def update(self):
+                "returns dict {collection name : list of data blocks added since the last call}"
+                np = self.np
+                res = {}
+                for name in self.COLLECTIONS:
+                    collection = getattr(bpy.data, name)
+                    res[name] = []
+                    if len(collection) == self.counts[name]:
+                        # the importer doesn't remove anything, so nothing new
+                        continue
+                    self.counts[name] = len(collection)
+                    keys = self.get_keys(collection)
+                    known = self.keys[name]
+                    if np:
+                        keys = np.array(keys, dtype=np.uint64)
+                        isin = getattr(np, "isin", None) or np.in1d
+                        new = np.flatnonzero(~isin(keys, known))
+                        if len(new):
+                            # indexing the ID lists walks them from the start, so they are taken in one pass
+                            items = collection[:]
+                            res[name] = [items[i] for i in new]
+                            self.keys[name] = np.union1d(known, keys[new])
+                    else:
+                        new_keys = set(keys).difference(known)
+                        if new_keys:
+                            res[name] = [item for item, key in zip(collection, keys) if key in new_keys]
+                            known.update(new_keys)
+                return res
+
+        class FbxParsePipeline(object):
+            "parses the next fbx files in worker processes, while the current one is being imported"
+
+            # it loads parse_fbx.py (and data_types.py) without the package __init__, which needs bpy,
+            # under the same names, so the parsed FBXElem trees unpickle here as they are
+            WORKER_SOURCE = '''
+                import os, sys, types, pickle, importlib
+                package = types.ModuleType("io_scene_fbx")
+                package.__path__ = [os.path.dirname(sys.argv[1])]
+                sys.modules["io_scene_fbx"] = package
+                parse_fbx = importlib.import_module("io_scene_fbx.parse_fbx")
+                result = parse_fbx.parse(sys.argv[2])
+                pickle.dump(result, sys.stdout.buffer, protocol=pickle.HIGHEST_PROTOCOL)
+                '''
+
+            def __init__(self, paths, jobs):
+                import os
+                import textwrap
+                from collections import deque
+                from concurrent.futures import ThreadPoolExecutor
+                from . import parse_fbx
+                self.parse_fbx_file = parse_fbx.__file__
+                self.worker_source = textwrap.dedent(self.WORKER_SOURCE)
+                self.python = self.find_python()
+                self.paths = deque(paths)
+                self.jobs = jobs
+                self.futures = deque()
+                self.executor = ThreadPoolExecutor(max_workers=jobs) if self.python else None
+                self.fill()
+
+            @staticmethod
+            def find_python():
+                "returns python executable for the workers, or None"
+                import os
+                import sys
+                # blender < 2.91 has its own binary there
+                for python in (getattr(bpy.app, "binary_path_python", None), sys.executable):
+                    if python and "python" in os.path.basename(python).lower() and os.path.isfile(python):
+                        return python
+                return None
+
+            def fill(self):
+                "keeps 'jobs' files being parsed ahead"
+                while self.executor and self.paths and len(self.futures) < self.jobs:
+                    path = self.paths.popleft()
+                    self.futures.append((path, self.executor.submit(self.parse_in_worker, path)))
+
+            def parse_in_worker(self, path):
+                "returns parse_fbx.parse() result of the file parsed in a worker process, or None"
+                import pickle
+                import subprocess
+                proc = subprocess.Popen([self.python, "-c", self.worker_source, self.parse_fbx_file, path],
+                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                out, err = proc.communicate()
+                if proc.returncode != 0:
+                    print("parsing {} in worker failed: {}".format(path, err.decode("utf-8", "replace").strip()))
+                    return None
+                return pickle.loads(out)
+
+            def take(self, path):
+                "returns the parsed file (the next one in order), or None if it should be parsed as usual"
+                if not self.futures or self.futures[0][0] != path:
+                    return None
+                _, future = self.futures.popleft()
+                self.fill()
+                try:
+                    return future.result()
+                except Exception as e:
+                    print("parsing {} in worker failed: {}".format(path, e))
+                    return None
+
+            def close(self):
+                if self.executor:
+                    for _, future in self.futures:
+                        future.cancel()
+                    self.executor.shutdown(wait=True)
+
         """,
 
     "use_cycles" : "    keywords['use_cycles'] = (context.scene.render.engine == 'CYCLES')",
 
     "execute" : r"""
-        def import_single_fbx(self, context, path, **keywords):
+        def import_single_fbx(self, context, path, parsed=None, **keywords):
             import sys
             from . import import_fbx
+            from . import parse_fbx
             save_stdout = sys.stdout
+            save_parse = parse_fbx.parse
+            if parsed is not None:
+                # it's parsed already, give it to the importer
+                parse_fbx.parse = lambda fn, *args, **kwargs: parsed if fn == path else save_parse(fn, *args, **kwargs)
             try:
                 if not self.verbose:
                     print("\nImporting {}".format(path))
@@ -188,12 +336,13 @@ patch_lines = {
                 ret = import_fbx.load(self, context, filepath=path, **keywords)
             finally:
                 sys.stdout = save_stdout
+                parse_fbx.parse = save_parse
             return ret
 
         def execute(self, context):
             FBXPATH_TAG_NAME = "fbxpath"
             keywords = self.as_keywords(ignore=("add_tags", "verbose", "action_fake_user", "action_filter_names",
-                "filter_glob", "directory", "ui_tab", "filepath", "files"))
+                "parse_jobs", "filter_glob", "directory", "ui_tab", "filepath", "files"))
 
             import os
 
@@ -203,17 +352,25 @@ patch_lines = {
             else:
                 fbx_files = [self.filepath,]
 
-            # store current objects_list
-            objects_list = [obj for obj in context.scene.objects]
-            actions_list = [obj for obj in bpy.data.actions]
-            cnt_meshes = cnt_armatures = cnt_actions = cnt_files = 0
+            # store current data blocks
+            snapshot = DataSnapshot()
+            cnt_meshes = cnt_armatures = cnt_actions = cnt_materials = cnt_images = cnt_files = 0
 
             error_messages = []
 
+            # the next files are parsed in parallel with the current one import
+            pipeline = None
+            if self.parse_jobs > 0 and len(fbx_files) > 1:
+                try:
+                    pipeline = FbxParsePipeline(fbx_files, self.parse_jobs)
+                except Exception as e:
+                    print("no parse pipeline, importing one by one: {}".format(e))
+
             ret = {'CANCELLED'}
             for path in fbx_files:
                 try:
-                    if self.import_single_fbx(context, path, **keywords) == {'FINISHED'}:
+                    parsed = pipeline.take(path) if pipeline else None
+                    if self.import_single_fbx(context, path, parsed=parsed, **keywords) == {'FINISHED'}:
                         ret = {'FINISHED'}
                 except Exception as e:
                     mess = "file {}: {}".format(path, e)
@@ -223,23 +380,28 @@ patch_lines = {
                     continue
 
                 cnt_files += 1
-                # find all new_objects added with last import
-                new_objects = [obj for obj in context.scene.objects if obj not in objects_list]
-                new_actions = [obj for obj in bpy.data.actions if obj not in actions_list]
-                actions_list = [obj for obj in bpy.data.actions]
+                # find all the data blocks added with last import
+                new_data = snapshot.update()
+                new_objects = new_data["objects"]
+                new_actions = new_data["actions"]
                 cnt_actions += len(new_actions)
+                cnt_materials += len(new_data["materials"])
+                cnt_images += len(new_data["images"])
+
+                if self.add_tags:
+                    # add a custom property with the source path
+                    for name in ("meshes", "armatures", "materials", "images"):
+                        for new_block in new_data[name]:
+                            new_block[FBXPATH_TAG_NAME] = path
 
                 for new_object in new_objects:
                     if self.add_tags:
-                        # add a custom property with the source path
                         new_object[FBXPATH_TAG_NAME] = path
                         if new_object.data:
                             try:
                                 new_object.data[FBXPATH_TAG_NAME] = path
                             except:
                                 pass
-                    # register the new object
-                    objects_list.append(new_object)
                     if new_object.type == 'MESH':
                         cnt_meshes += 1
                     elif new_object.type == 'ARMATURE':
@@ -261,8 +423,11 @@ patch_lines = {
                     print(mess)
                     self.report({'DEBUG'}, mess)
 
-            mess = "Finished. Imported meshes [{}]; armatures [{}]; actions [{}]; from {} files.".format(
-                            cnt_meshes, cnt_armatures, cnt_actions, cnt_files
+            if pipeline:
+                pipeline.close()
+
+            mess = "Finished. Imported meshes [{}]; armatures [{}]; actions [{}]; materials [{}]; images [{}]; from {} files.".format(
+                            cnt_meshes, cnt_armatures, cnt_actions, cnt_materials, cnt_images, cnt_files
                             )
             print(mess)
             self.report({'INFO'}, mess)
@@ -283,8 +448,8 @@ def add_padding(s, pad_sz):
     pad = " "*pad_sz
     return "\n".join((pad + s1 for s1 in inspect.cleandoc(s).split("\n")))
 
-def patch_module(module):
-    " patches module source, recompiles it, and returns the patched one"
+def compile_patched_module(module):
+    " patches module source, and returns its compiled code"
     # first read the code
     src_lines = []
     with open(module.__file__, "r", encoding="utf-8") as f:
@@ -366,8 +531,79 @@ def patch_module(module):
     if DEBUG:
         bpy.context.window_manager.clipboard = "\n".join(src_lines)
 
+    return compile("\n".join(src_lines), filename=module.__file__, mode='exec')
+
+def get_cache_dir():
+    "returns directory for the cached patched code"
+    import os
+    try:
+        # blender 4.2+
+        base = bpy.utils.user_resource('CACHE')
+    except (TypeError, ValueError):
+        if sys.platform == "win32":
+            base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        elif sys.platform == "darwin":
+            base = os.path.expanduser("~/Library/Caches")
+        else:
+            base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "fbx_batch_import_patch")
+
+def get_cache_prefix():
+    """ returns file name prefix of the cached code of this blender version, so the versions installed
+    side by side don't replace each other's cache """
+    return "{}_{}_".format(FBX_IMPORT_MODULE_NAME, "_".join(str(v) for v in bpy.app.version))
+
+def get_cache_path(source):
+    """ returns path of the cached patched code of the module source (bytes); the name is a hash of
+    the source, the patch itself, and the blender, add-on and python versions. """
+    import os
+    import hashlib
+    import importlib.util
+    h = hashlib.sha1(source)
+    h.update(repr((bpy.app.version, bl_info["version"], sys.version, importlib.util.MAGIC_NUMBER,
+                   sorted(patch_lines.items()))).encode("utf-8"))
+    return os.path.join(get_cache_dir(), "{}{}.marshal".format(get_cache_prefix(), h.hexdigest()))
+
+def load_cached_code(cache_path):
+    "returns the cached code object, or None"
+    import marshal
+    try:
+        with open(cache_path, "rb") as f:
+            return marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+def save_cached_code(cache_path, code):
+    "saves the code object to the cache, replacing the outdated ones of the same blender version"
+    import os
+    import marshal
+    try:
+        cache_dir = os.path.dirname(cache_path)
+        os.makedirs(cache_dir, exist_ok=True)
+        prefix = get_cache_prefix()
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix) and name.endswith(".marshal"):
+                os.remove(os.path.join(cache_dir, name))
+        # no half written file for the next start
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            marshal.dump(code, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print("can't cache the patched {}: {}".format(FBX_IMPORT_MODULE_NAME, e))
+
+def patch_module(module):
+    " patches module source (or takes it from the cache), recompiles it, and returns the patched one"
+    with open(module.__file__, "rb") as f:
+        source = f.read()
+    cache_path = get_cache_path(source)
+
+    code = None if DEBUG else load_cached_code(cache_path)
+    if code is None:
+        code = compile_patched_module(module)
+        save_cached_code(cache_path, code)
+
     # using the same module
-    code = compile("\n".join(src_lines), filename=module.__file__, mode='exec')
     exec(code, module.__dict__)
     return module
 
@@ -428,7 +664,8 @@ def register():
     install_fbx_hook()
     # we will reload it on re-enabling anyway, so let's give the user some more room
     for name in ("load_module_if_not_yet", "AstNode", "iter_patch_points",
-                 "path_lines", "add_padding", "patch_module", "install_fbx_hook"):
+                 "path_lines", "add_padding", "compile_patched_module", "get_cache_dir", "get_cache_path",
+                 "load_cached_code", "save_cached_code", "patch_module", "install_fbx_hook"):
         try:
             del globals()[name]
         except KeyError:
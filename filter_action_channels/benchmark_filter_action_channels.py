@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of filter_action_channels.py on synthetic armatures and actions.
+
+usage:
+    blender -b --factory-startup --python benchmark_filter_action_channels.py -- [--bones N]
+        [--channels N] [--keys N] [--actions N] [--constant F] [--absent F] [--connected F]
+        [--repeat N] [--no-legacy] [--output PATH] [filter options]
+
+It generates an armature with the given number of bones (some of them connected), and actions with
+the given number of channels per bone and keyframes per channel, where known fractions of the
+channels are constant, or belong to absent bones. Then it times the filter in dry run and in real
+mode, and the real mode again with the old keyframe-by-keyframe truncation (unless --no-legacy) to
+report the time saved by the bulk one. It prints the results as a json line (and writes them to --output
+if given).
+The filter options are the same as in the headless mode of the filter (see its --help).
+
+@author: (c) LVII-LIX A.S. Mechanic.Kharkiv
+@last_edit: 2026-10-17
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import bpy
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import filter_action_channels as fac
+
+# bone channels in the order of use (--channels takes the first N)
+BONE_CHANNELS = [("location", i) for i in range(3)] + \
+                [("rotation_quaternion", i) for i in range(4)] + \
+                [("scale", i) for i in range(3)]
+
+
+def link_object(obj):
+    if bpy.app.version < (2, 80, 0):
+        bpy.context.scene.objects.link(obj)
+        bpy.context.scene.objects.active = obj
+    else:
+        bpy.context.scene.collection.objects.link(obj)
+        bpy.context.view_layer.objects.active = obj
+
+def make_armature(n_bones, connected):
+    "returns armature object with a chain of bones, the given fraction of them connected"
+    arm = bpy.data.armatures.new("bench_armature")
+    obj = bpy.data.objects.new("bench_armature", arm)
+    link_object(obj)
+    bpy.ops.object.mode_set(mode='EDIT')
+    n_connected = int(round((n_bones - 1) * connected))
+    prev = None
+    for i in range(n_bones):
+        eb = arm.edit_bones.new("bone_{:04d}".format(i))
+        eb.head = (0.0, 0.0, float(i))
+        eb.tail = (0.0, 0.0, float(i + 1))
+        if prev:
+            eb.parent = prev
+            eb.use_connect = i <= n_connected
+        prev = eb
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return obj
+
+def make_action(name, n_bones, n_channels, n_keys, constant, absent, rnd):
+    """returns action with n_channels fcurves per bone of n_keys keyframes each;
+    the 'constant' fraction of fcurves is constant, the 'absent' fraction of bones doesn't exist"""
+    action = bpy.data.actions.new(name)
+    n_absent = int(round(n_bones * absent))
+    times = np.arange(n_keys, dtype=np.float32)
+    co = np.empty(n_keys * 2, dtype=np.float32)
+    co[0::2] = times
+    for i in range(n_bones + n_absent):
+        # absent bones go after the existing ones
+        bone_name = "bone_{:04d}".format(i) if i < n_bones else "absent_{:04d}".format(i)
+        for data_path, index in BONE_CHANNELS[:n_channels]:
+            fc = action.fcurves.new('pose.bones["{}"].{}'.format(bone_name, data_path), index=index, action_group=bone_name)
+            if rnd.random_sample() < constant:
+                co[1::2] = rnd.random_sample()
+            else:
+                co[1::2] = np.sin(times * rnd.uniform(0.01, 0.1)) + rnd.normal(0.0, 0.01, n_keys)
+            fc.keyframe_points.add(n_keys)
+            fc.keyframe_points.foreach_set("co", co)
+            fc.update()
+    return action
+
+def run(args, filter_options):
+    results = []
+    obj = make_armature(args.bones, args.connected)
+    obj.animation_data_create()
+
+    # (dry run, legacy truncation)
+    modes = [(True, False), (False, False)] + ([] if args.no_legacy else [(False, True)])
+    for dry_run, legacy in modes:
+        for repeat in range(args.repeat):
+            # fresh actions each time, the real mode changes them; the same ones in each mode
+            rnd = np.random.RandomState(args.seed + repeat)
+            _t = time.perf_counter()
+            action_refs = {}
+            for i in range(args.actions):
+                action = make_action("bench_action_{}".format(i), args.bones, args.channels, args.keys,
+                                     args.constant, args.absent, rnd)
+                action_refs[action] = {obj}
+            generate_time = time.perf_counter() - _t
+
+            options = dict(filter_options, dry_run=dry_run, use_fingerprints=False, verbose=False,
+                           legacy_truncate=legacy)
+            op = fac.FilterSession(**options)
+            _t = time.perf_counter()
+            op.total_actions = len(action_refs)
+            fac.filter_actions(op, action_refs)
+            filter_time = time.perf_counter() - _t
+
+            results.append({
+                "dry_run" : dry_run,
+                "truncation" : "legacy" if legacy else "bulk",
+                "repeat" : repeat,
+                "generate_time" : generate_time,
+                "filter_time" : filter_time,
+                "keyframes_per_second" : op.total_keyframes / filter_time if filter_time > 0 else None,
+                "total_fcurves" : op.total_fcurves,
+                "total_keyframes" : op.total_keyframes,
+                "killed_fcurves" : op.killed_fcurves,
+                "killed_keyframes" : op.killed_keyframes,
+                "truncate_time" : op.truncate_time,
+                })
+            for action in action_refs:
+                bpy.data.actions.remove(action)
+    return results
+
+def get_truncation_summary(results):
+    "returns dict of the mean truncation time of both ways in real mode, the time saved and the speedup"
+    times = {}
+    for r in results:
+        if not r["dry_run"]:
+            times.setdefault(r["truncation"], []).append(r["truncate_time"])
+    res = {name : sum(t) / len(t) for name, t in times.items()}
+    if "legacy" in res:
+        res["saved"] = res["legacy"] - res["bulk"]
+        res["speedup"] = res["legacy"] / res["bulk"] if res["bulk"] > 0 else None
+    return res
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="blender -b --factory-startup --python benchmark_filter_action_channels.py --",
+        description="Times filter_action_channels on synthetic actions.")
+    parser.add_argument("--bones", type=int, default=100, help="Number of bones (default 100).")
+    parser.add_argument("--channels", type=int, default=10, help="Channels per bone, up to 10 (default 10).")
+    parser.add_argument("--keys", type=int, default=10000, help="Keyframes per channel (default 10000).")
+    parser.add_argument("--actions", type=int, default=1, help="Number of actions (default 1).")
+    parser.add_argument("--constant", type=float, default=0.3, help="Fraction of constant channels (default 0.3).")
+    parser.add_argument("--absent", type=float, default=0.1, help="Absent bones, as a fraction of bones (default 0.1).")
+    parser.add_argument("--connected", type=float, default=0.5, help="Fraction of connected bones (default 0.5).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each mode (default 1).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0).")
+    parser.add_argument("--no-legacy", action="store_true",
+                        help="Don't compare with the old keyframe-by-keyframe truncation.")
+    parser.add_argument("--output", help="Write the results to this json file.")
+    args, rest = parser.parse_known_args(argv)
+    filter_options = vars(fac.make_cli_parser().parse_args(rest))
+    for name in ("save", "save_as"):
+        filter_options.pop(name)
+
+    bpy.ops.wm.read_factory_settings(use_empty=True)
+    res = {
+        "blender" : bpy.app.version_string,
+        "filter_version" : fac.bl_info["version"],
+        "numpy" : fac.np is not None,
+        "config" : {name : getattr(args, name) for name in ("bones", "channels", "keys", "actions",
+                    "constant", "absent", "connected", "repeat", "seed", "no_legacy")},
+        "filter_options" : filter_options,
+        "results" : run(args, filter_options),
+        }
+    res["truncation"] = get_truncation_summary(res["results"])
+    if "saved" in res["truncation"]:
+        print("truncation: bulk {bulk:.3f}s, legacy {legacy:.3f}s, saved {saved:.3f}s".format(**res["truncation"]))
+    print(json.dumps(res))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=1)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []))
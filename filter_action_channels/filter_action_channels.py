@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 """
-The script will remove unnecessary animation data from actions of selected Armatures.
+The script will remove unnecessary animation data from actions of selected objects
+(Armatures, and any animated datablocks: objects, their data, shape keys, materials, node trees).
+The bone filters work on armatures' actions only.
 
 - It removes all channels of absent bones (could be dangerous, if the action is used on
     another object, where they could exist);
@@ -9,15 +11,17 @@ The script will remove unnecessary animation data from actions of selected Armat
     (also could be dangerous, if the action is intended for use on other objects);
 - It kills all keyframes but the first, if their values don't change at all (safe);
 
+Also there is an operator to merge identical actions into one.
+
 @author: (c) LVII-LIX A.S. Mechanic.Kharkiv
-@last_edit: 2024-03-12
+@last_edit: 2026-10-17
 """
 
 bl_info = {
     "name": "Filter action channels operator",
     "description": "Operator to filter redundant animation data in actions to compact them.",
     "location": "3D View > Object Mode > Object > Animation menu",
-    "version": (1, 1, 1),
+    "version": (1, 13, 0),
     "blender": (2, 80, 0),
     "support": "COMMUNITY",
     "wiki_url": "https://github.com/mechanic-kharkiv/small-blender-scripts/tree/master/filter_action_channels",
@@ -30,28 +34,85 @@ bl_info = {
 
 import bpy
 import re
+import sys
+import math
+import time
+import array
+import hashlib
 from _collections import defaultdict
-from bpy.props import BoolProperty
+from bpy.props import BoolProperty, FloatProperty, IntProperty, StringProperty
+from bpy.app.handlers import persistent
+try:
+    import numpy as np
+except ImportError:
+    # very old blender builds come without numpy, so we fall back to plain loops
+    np = None
 
 EPSILON = 0.000001
 
+# custom property of actions to store the fingerprint of the last filtering in
+PROP_FINGERPRINT = "filter_action_channels_fingerprint"
+
+# operator options which affect the filtering result (they go into the fingerprint)
+FINGERPRINT_OPTIONS = ("filter_constant_keys", "filter_decimate", "decimate_tolerance",
+                       "filter_absent_bones", "filter_connected_loc", "filter_identity_channels",
+                       "quantize", "quantize_location", "quantize_rotation", "quantize_scale",
+                       "verify", "verify_tolerance")
+
+# rest pose (identity) values of pose bone channels by the array index
+POSE_CHANNEL_DEFAULTS = {
+    "location" : (0.0, 0.0, 0.0),
+    "rotation_quaternion" : (1.0, 0.0, 0.0, 0.0),
+    "rotation_euler" : (0.0, 0.0, 0.0),
+    "rotation_axis_angle" : (0.0, 0.0, 1.0, 0.0),
+    "scale" : (1.0, 1.0, 1.0),
+}
+
 # finds a bone name and channel name in the data path to groups 1, 2
 REO_PATT_PARSE_DATA_PATH = re.compile(r'(?:pose\.bones\[")(.+?)(?:"]\.)(.+)')
 
 
-def value_changes(fcurve):
-    """ returns true if fcurve value changes even once. """
+def get_keyframes_co(fcurve):
+    """ returns (N, 2) numpy array of keyframes' (time, value), read in one call. """
+    kfp = fcurve.keyframe_points
+    co = np.empty(len(kfp) * 2, dtype=np.float32)
+    kfp.foreach_get("co", co)
+    return co.reshape(-1, 2)
+
+def keys_value_changes(co):
+    "returns true if the value changes even once in (N, 2) array of keyframes' coordinates"
+    values = co[:, 1].astype(np.float64)
+    return bool((np.abs(values - values[0]) >= EPSILON).any())
+
+def keys_are_sorted(co):
+    "returns True if (N, 2) array of keyframes' coordinates is sorted by time"
+    return not (co[1:, 0] < co[:-1, 0]).any()
+
+def value_changes(fcurve, co=None):
+    """ returns true if fcurve value changes even once.
+    co - optional keyframes' coordinates from get_keyframes_co() to avoid reading them again. """
     if len(fcurve.keyframe_points) < 2:
         return False
 
+    if np is not None:
+        if co is None:
+            co = get_keyframes_co(fcurve)
+        return keys_value_changes(co)
+
     _old = fcurve.keyframe_points[0].co[1]
     return any(map(lambda kf : abs(_old - kf.co[1]) >= EPSILON, fcurve.keyframe_points))
 
-def fcurve_is_sorted(fcurve):
-    """ returns True if keyframes are sorted by time. """
+def fcurve_is_sorted(fcurve, co=None):
+    """ returns True if keyframes are sorted by time.
+    co - optional keyframes' coordinates from get_keyframes_co() to avoid reading them again. """
     if len(fcurve.keyframe_points) < 2:
         return True
 
+    if np is not None:
+        if co is None:
+            co = get_keyframes_co(fcurve)
+        return keys_are_sorted(co)
+
     keys = fcurve.keyframe_points
     v = keys[0].co[0]
     for key in keys:
@@ -61,8 +122,426 @@ def fcurve_is_sorted(fcurve):
         v = key.co[0]
     return True
 
+# keyframe properties to keep when an f-curve is rebuilt (the handle types go before handles)
+KEYFRAME_PROPS = ("co", "interpolation", "easing", "back", "amplitude", "period", "type",
+                  "handle_left_type", "handle_right_type", "handle_left", "handle_right")
+
+def store_keyframe(kf):
+    """ returns dict of the keyframe properties' values. """
+    res = {}
+    for name in KEYFRAME_PROPS:
+        if hasattr(kf, name):
+            v = getattr(kf, name)
+            if name in ("co", "handle_left", "handle_right"):
+                v = tuple(v)
+            res[name] = v
+    return res
+
+def restore_keyframe(kf, data):
+    """ sets the keyframe properties from dict returned by store_keyframe(). """
+    for name, v in data.items():
+        setattr(kf, name, v)
+
+def truncate_keyframes(fcurve, legacy=False):
+    """ truncates fcurve to its first keyframe (keyframes are expected to be sorted).
+    The first keyframe is kept intact (value, interpolation, handles).
+    legacy - use the old keyframe-by-keyframe removing (for comparison). """
+    kfp = fcurve.keyframe_points
+    if legacy or not hasattr(kfp, "clear"):
+        # old blender has no bulk clear()
+        i = len(kfp)
+        while (i > 1):
+            i -= 1
+            kfp.remove(kfp[i], fast=True)
+        fcurve.update()
+        return
+
+    first = store_keyframe(kfp[0])
+    kfp.clear()
+    kfp.add(1)
+    # no fcurve.update() here: it would recalculate the auto handles
+    restore_keyframe(kfp[0], first)
+
+# 2D keyframe properties (the others are scalars)
+KEYFRAME_VECTOR_PROPS = ("co", "handle_left", "handle_right")
+
+def read_keyframes(fcurve):
+    """ returns dict {property name : numpy array} of all the keyframes' properties, read in bulk.
+    Enum properties are read as their integer values. """
+    kfp = fcurve.keyframe_points
+    n = len(kfp)
+    res = {}
+    if n == 0:
+        return res
+
+    kf = kfp[0]
+    for name in KEYFRAME_PROPS:
+        if not hasattr(kf, name):
+            continue
+        if name in KEYFRAME_VECTOR_PROPS:
+            a = np.empty(n * 2, dtype=np.float32)
+        elif isinstance(getattr(kf, name), str):
+            a = np.empty(n, dtype=np.intc)
+        else:
+            a = np.empty(n, dtype=np.float32)
+        kfp.foreach_get(name, a)
+        res[name] = a
+    return res
+
+def write_keyframes(fcurve, data, keep=None, update=True):
+    """ rebuilds fcurve keyframes from arrays returned by read_keyframes().
+    keep - sorted indices of the keyframes to write, all of them if None;
+    update - recalculate handles (not needed if the keyframes are restored as they were). """
+    n_old = len(data["co"]) // 2
+    if keep is not None:
+        data = {name : a.reshape(n_old, -1)[keep].ravel() for name, a in data.items()}
+    n = len(data["co"]) // 2
+
+    kfp = fcurve.keyframe_points
+    if hasattr(kfp, "clear") and len(kfp) > n:
+        kfp.clear()
+    while len(kfp) > n:
+        kfp.remove(kfp[len(kfp) - 1], fast=True)
+    if len(kfp) < n:
+        kfp.add(n - len(kfp))
+
+    for name in KEYFRAME_PROPS:
+        if name in data:
+            kfp.foreach_set(name, data[name])
+    if update:
+        # neighbours changed, so auto handles should be recalculated
+        fcurve.update()
+
+def linearize_decimated_spans(fcurve, keep):
+    """ makes linear the kept keyframes (keep - their old indices, as of decimate_keys()), which start
+    the spans of removed ones, so the curve is the straight line the error was measured against.
+    Then it recalculates the handles. """
+    kfp = fcurve.keyframe_points
+    for i in np.flatnonzero(np.diff(keep) > 1):
+        kfp[int(i)].interpolation = 'LINEAR'
+    fcurve.update()
+
+def decimate_keys(co, tolerance):
+    """ returns indices of keyframes to keep, so that straight lines between them reproduce
+    all the dropped keyframes' values within tolerance (Ramer-Douglas-Peucker algorithm).
+    co - (N, 2) array of keyframes sorted by time.
+    All segments of each subdivision level are processed at once. """
+    n = len(co)
+    if n < 3:
+        return np.arange(n)
+
+    t = co[:, 0].astype(np.float64)
+    v = co[:, 1].astype(np.float64)
+    idx = np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    while True:
+        kept = np.flatnonzero(keep)
+        # the segment (between two kept keys) of each key
+        seg = np.minimum(np.searchsorted(kept, idx, side="right") - 1, len(kept) - 2)
+        i0, i1 = kept[seg], kept[seg + 1]
+        dt = t[i1] - t[i0]
+        w = np.divide(t - t[i0], dt, out=np.zeros(n), where=dt > 0)
+        err = np.abs(v - (v[i0] + (v[i1] - v[i0]) * w))
+        err[keep] = 0.0
+        bad = np.flatnonzero(err > tolerance)
+        if len(bad) == 0:
+            break
+
+        # keep the worst key of every segment which doesn't fit
+        bad = bad[np.lexsort((err[bad], seg[bad]))]
+        last_in_seg = np.append(seg[bad][1:] != seg[bad][:-1], True)
+        keep[bad[last_in_seg]] = True
+    return np.flatnonzero(keep)
+
+def remove_fcurves(action, fcurves_to_kill):
+    "removes the fcurves from the action in one pass, then removes channel groups left empty"
+    fcurves = action.fcurves
+    groups = {fc.group for fc in fcurves_to_kill if fc.group is not None}
+    if len(fcurves_to_kill) == len(fcurves) and hasattr(fcurves, "clear"):
+        fcurves.clear()
+    else:
+        for fc in fcurves_to_kill:
+            fcurves.remove(fc)
+    for group in groups:
+        if len(group.channels) == 0:
+            action.groups.remove(group)
+
+def get_quantize_grid(op, data_path):
+    "returns quantization grid step for the channel type (location, rotation, scale), or None"
+    channel = data_path.rpartition(".")[2]
+    if channel.endswith("location"):
+        grid = op.quantize_location
+    elif channel.startswith("rotation_"):
+        grid = op.quantize_rotation
+    elif channel.endswith("scale"):
+        grid = op.quantize_scale
+    else:
+        return None
+    return grid if grid > 0.0 else None
+
+def quantize_values(values, grid):
+    "returns values snapped to the grid"
+    return (np.round(values / grid) * grid).astype(values.dtype)
+
+def get_inner_duplicates(values):
+    "returns boolean mask of values equal to both neighbours (the inner ones of equal runs)"
+    res = np.zeros(len(values), dtype=bool)
+    if len(values) > 2:
+        res[1:-1] = (values[1:-1] == values[:-2]) & (values[1:-1] == values[2:])
+    return res
+
+def analyze_keyframes(co, grid, check_constant, decimate_tolerance):
+    """ returns dict with the keyframe filters' decisions on (N, 2) array of keyframes' coordinates:
+    is_sorted - the keyframes are sorted by time (the rest is about the sorted ones);
+    quantize_keep - indices of keyframes to keep after the quantization by the grid (None - no changes);
+    constant - the (quantized) values don't change;
+    decimate_keep - indices of the (quantized) keyframes to keep after decimation (None - no changes).
+    It uses nothing from blender, so it runs in worker processes too. """
+    res = {"is_sorted" : keys_are_sorted(co), "quantize_keep" : None, "constant" : False, "decimate_keep" : None}
+    if not res["is_sorted"]:
+        co = co[np.argsort(co[:, 0], kind="stable")]
+
+    if grid and len(co) > 0:
+        values = quantize_values(co[:, 1], grid)
+        keep = np.flatnonzero(~get_inner_duplicates(values))
+        if len(keep) < len(co) or (values != co[:, 1]).any():
+            res["quantize_keep"] = keep
+            co = np.stack((co[keep, 0], values[keep]), axis=1)
+
+    res["constant"] = check_constant and len(co) > 1 and not keys_value_changes(co)
+
+    if decimate_tolerance is not None and not res["constant"] and len(co) > 2:
+        keep = decimate_keys(co, decimate_tolerance)
+        if len(keep) < len(co):
+            res["decimate_keep"] = keep
+    return res
+
+def analyze_fcurve(op, fcurve):
+    "returns analyze_keyframes() result for the fcurve with the filter options"
+    if np is None:
+        # only the constant filter works without numpy
+        constant = op.filter_constant_keys and len(fcurve.keyframe_points) > 1 and not value_changes(fcurve)
+        return {"is_sorted" : fcurve_is_sorted(fcurve) if constant else True, "quantize_keep" : None,
+                "constant" : constant, "decimate_keep" : None}
+
+    return analyze_keyframes(get_keyframes_co(fcurve),
+                             get_quantize_grid(op, fcurve.data_path) if op.quantize else None,
+                             op.filter_constant_keys,
+                             op.decimate_tolerance if op.filter_decimate else None)
+
+def _analyze_shared_keyframes(conn, shm_name, size, specs, check_constant, decimate_tolerance):
+    """ worker process: analyzes fcurves' keyframes from the shared memory block.
+    specs - list of (offset, number of keyframes, quantize grid) of each fcurve;
+    sends to conn list of (analyze_keyframes() result, digest) of each fcurve, or the exception. """
+    from multiprocessing import shared_memory
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            buf = np.ndarray((size,), dtype=np.float32, buffer=shm.buf)
+            res = []
+            # the views must be released before closing the block, even if there were no fcurves
+            co = None
+            for offset, n, grid in specs:
+                co = buf[offset * 2 : (offset + n) * 2].reshape(-1, 2)
+                res.append((analyze_keyframes(co, grid, check_constant, decimate_tolerance),
+                            hashlib.sha1(co.tobytes()).digest()))
+            del buf, co
+        finally:
+            shm.close()
+    except Exception as e:
+        res = e
+    conn.send(res)
+    conn.close()
+
+def can_analyze_in_parallel():
+    "returns True if the worker processes can be used here"
+    try:
+        import multiprocessing
+        from multiprocessing import shared_memory
+    except ImportError:
+        # python < 3.8
+        return False
+    # the workers are forked: a spawned process would have to import this module without blender.
+    # Forking the blender process is safe only on linux (on mac the system frameworks don't survive it)
+    return (np is not None and sys.platform.startswith("linux")
+            and "fork" in multiprocessing.get_all_start_methods())
+
+def analyze_actions_parallel(op, actions, jobs):
+    """ analyzes keyframes of all the actions' fcurves in worker processes.
+    The keyframes are exported into one shared memory block, and the workers return only the decisions.
+    Returns dict {(action, fcurve index) : analyze_keyframes() result}, and dict {action : list of digests}. """
+    import multiprocessing
+    from multiprocessing import shared_memory
+
+    items = []  # (action, fcurve index, offset, number of keyframes, grid)
+    size = 0
+    for action in actions:
+        for i, fc in enumerate(action.fcurves):
+            n = len(fc.keyframe_points)
+            grid = get_quantize_grid(op, fc.data_path) if op.quantize else None
+            items.append((action, i, size, n, grid))
+            size += n
+
+    analyses, digests = {}, defaultdict(list)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, size * 2 * 4))
+    try:
+        buf = np.ndarray((size * 2,), dtype=np.float32, buffer=shm.buf)
+        for action, i, offset, n, grid in items:
+            if n:
+                action.fcurves[i].keyframe_points.foreach_get("co", buf[offset * 2 : (offset + n) * 2])
+        del buf
+
+        # about the same number of keyframes per process
+        chunks = [[] for _ in range(min(jobs, len(items)))]
+        chunk_keys = [0] * len(chunks)
+        for item in sorted(items, key=lambda item: -item[3]):
+            j = chunk_keys.index(min(chunk_keys))
+            chunks[j].append(item)
+            chunk_keys[j] += item[3]
+        # fcurves without keys tie at 0 and may leave some chunks empty
+        chunks = [chunk for chunk in chunks if chunk]
+
+        # forked processes get their arguments without pickling, so it works for the script
+        # run as __main__ too; only the results go back through the pipes
+        ctx = multiprocessing.get_context("fork")
+        decimate_tolerance = op.decimate_tolerance if op.filter_decimate else None
+        workers = []
+        try:
+            for chunk in chunks:
+                recv_conn, send_conn = ctx.Pipe(duplex=False)
+                proc = ctx.Process(target=_analyze_shared_keyframes, daemon=True,
+                                   args=(send_conn, shm.name, size * 2,
+                                         [(offset, n, grid) for _, _, offset, n, grid in chunk],
+                                         op.filter_constant_keys, decimate_tolerance))
+                proc.start()
+                send_conn.close()
+                workers.append((chunk, recv_conn, proc))
+
+            for chunk, recv_conn, proc in workers:
+                res = recv_conn.recv()
+                if isinstance(res, Exception):
+                    raise res
+                for (action, i, _, _, _), (analysis, digest) in zip(chunk, res):
+                    analyses[action, i] = analysis
+                    digests[action].append((i, digest))
+        finally:
+            for chunk, recv_conn, proc in workers:
+                recv_conn.close()
+                proc.join(1.0)
+                if proc.is_alive():
+                    proc.terminate()
+    finally:
+        shm.close()
+        shm.unlink()
+    return analyses, {action : [digest for _, digest in sorted(action_digests)]
+                      for action, action_digests in digests.items()}
+
+def sample_fcurve(fcurve, frames):
+    """ returns array of the fcurve values at the frames (sorted array). The frames on linear and
+    constant segments are interpolated in bulk; the rest (Bezier and easing segments, frames outside
+    the keys, fcurves with modifiers) are evaluated by blender, one call per frame. """
+    kfp = fcurve.keyframe_points
+    n = len(kfp)
+    res = np.empty(len(frames))
+    slow = np.ones(len(frames), dtype=bool)
+    if n and not len(fcurve.modifiers):
+        co = get_keyframes_co(fcurve).astype(np.float64)
+        at_last = frames == co[-1, 0]
+        res[at_last] = co[-1, 1]
+        slow &= ~at_last
+        if n > 1:
+            interpolation = np.empty(n, dtype=np.intc)
+            kfp.foreach_get("interpolation", interpolation)
+            items = kfp[0].bl_rna.properties["interpolation"].enum_items
+            # index of the key starting the segment of each frame
+            seg = np.searchsorted(co[:, 0], frames, side="right") - 1
+            inside = (seg >= 0) & (seg < n - 1)
+            seg = np.clip(seg, 0, n - 2)
+            x0, y0 = co[seg, 0], co[seg, 1]
+            x1, y1 = co[seg + 1, 0], co[seg + 1, 1]
+            linear = inside & (interpolation[seg] == items["LINEAR"].value)
+            constant = inside & (interpolation[seg] == items["CONSTANT"].value)
+            t = (frames - x0) / np.where(x1 > x0, x1 - x0, 1.0)
+            res[linear] = (y0 + (y1 - y0) * t)[linear]
+            res[constant] = y0[constant]
+            fast = linear | constant
+            # blender rounds the values of int and boolean channels, which python doesn't see,
+            # so one interpolated frame is checked
+            j = np.flatnonzero(linear)
+            if len(j) and abs(fcurve.evaluate(float(frames[j[len(j) // 2]])) - res[j[len(j) // 2]]) > 1e-4:
+                fast[:] = False
+            slow &= ~fast
+    _evaluate = fcurve.evaluate
+    for j in np.flatnonzero(slow):
+        res[j] = _evaluate(float(frames[j]))
+    return res
+
+def sample_fcurves(fcurves, frames):
+    """ returns (len(fcurves), len(frames)) array of fcurves' values at the frames (sample_fcurve()). """
+    frames = np.asarray(frames, dtype=np.float64)
+    res = np.empty((len(fcurves), len(frames)))
+    for i, fc in enumerate(fcurves):
+        res[i] = sample_fcurve(fc, frames)
+    return res
+
+class ActionVerifier:
+    "keeps samples and keyframes of f-curves before they are changed, to check or roll back them later"
+
+    def __init__(self, action):
+        start, end = action.frame_range
+        self.frames = [float(f) for f in range(math.floor(start), math.ceil(end) + 1)]
+        self.fcurves = []
+        self.samples = []
+        self.snapshots = []
+        self.added = set()
+
+    def add(self, fcurve):
+        "call it before the fcurve is changed (the first time)"
+        if fcurve in self.added:
+            return
+        self.added.add(fcurve)
+        self.fcurves.append(fcurve)
+        self.samples.append(sample_fcurves((fcurve,), self.frames)[0])
+        self.snapshots.append(read_keyframes(fcurve))
+
+    def get_errors(self):
+        "returns arrays of max and RMS errors of the changed fcurves"
+        diff = sample_fcurves(self.fcurves, self.frames) - np.array(self.samples)
+        return np.abs(diff).max(axis=1), np.sqrt((diff ** 2).mean(axis=1))
+
+    def rollback(self):
+        "restores the fcurves as they were"
+        for fc, data in zip(self.fcurves, self.snapshots):
+            write_keyframes(fc, data, update=False)
+
+def get_fcurve_digest(fcurve):
+    "returns sha1 digest of the fcurve keyframes' coordinates"
+    kfp = fcurve.keyframe_points
+    if np is not None:
+        co = get_keyframes_co(fcurve)
+    else:
+        co = array.array("f", bytes(len(kfp) * 2 * 4))
+        kfp.foreach_get("co", co)
+    return hashlib.sha1(co.tobytes()).digest()
+
+def get_action_fingerprint(op, action, *bone_sets, digests=None):
+    """ returns hex digest of the action's fcurves and keyframes, the filter options,
+    and the given bone name sets (they affect the bone filters).
+    digests - optional list of the fcurves' digests (get_fcurve_digest()) computed beforehand. """
+    h = hashlib.sha1()
+    fcurves = action.fcurves
+    h.update(repr((bl_info["version"], len(fcurves))).encode())
+    for i, fc in enumerate(fcurves):
+        h.update(repr((fc.data_path, fc.array_index, len(fc.keyframe_points))).encode())
+        h.update(digests[i] if digests is not None else get_fcurve_digest(fc))
+    h.update(repr([(name, getattr(op, name)) for name in FINGERPRINT_OPTIONS]).encode())
+    for bone_set in bone_sets:
+        h.update(repr(sorted(bone_set)).encode())
+    return h.hexdigest()
+
 def get_object_actions(obj, also_nla):
-    "returns set of actions from the object."
+    "returns set of actions from the object (or any other animated datablock)."
     res = set()
     if obj.animation_data:
         if obj.animation_data.action:
@@ -74,6 +553,24 @@ def get_object_actions(obj, also_nla):
                         res.add(strip.action)
     return res
 
+def get_animated_ids(obj):
+    "returns list of the object's datablocks with animation data (object, data, shape keys, materials, node trees)"
+    res = [obj]
+    data = obj.data
+    if data is not None:
+        res.append(data)
+        if getattr(data, "shape_keys", None):
+            res.append(data.shape_keys)
+        if getattr(data, "node_tree", None):
+            res.append(data.node_tree)
+    for slot in obj.material_slots:
+        mat = slot.material
+        if mat:
+            res.append(mat)
+            if getattr(mat, "node_tree", None):
+                res.append(mat.node_tree)
+    return [_id for _id in res if getattr(_id, "animation_data", None)]
+
 def get_existing_bones(obj):
     """ returns set of existing bone names of given armature object"""
     return {pb.name for pb in obj.pose.bones}
@@ -83,43 +580,212 @@ def get_disconnected_bones(obj):
     return {pb.name for pb in obj.pose.bones if pb.parent is None or not pb.bone.use_connect}
 
 
-def do_filter_channels(op, context):
+class ActionRefIndex:
+    """reverse index {action : set of armature objects referencing it directly or with NLA strips}.
+    It's built lazily on the first query, and then maintained by app handlers: they only mark
+    updated objects, which are re-indexed on the next query."""
+
+    def __init__(self):
+        self.refs = defaultdict(set)    # action -> objects
+        self.obj_actions = {}           # object -> actions
+        self.pending = set()            # objects to re-index
+        self.n_objects = -1             # to notice removed objects
+        self.valid = False
+
+    def invalidate(self):
+        "the index will be rebuilt on the next query"
+        self.valid = False
+        self.pending.clear()
+
+    def mark_updated(self, obj):
+        "the object's references will be refreshed on the next query"
+        if self.valid:
+            self.pending.add(obj)
+
+    def _unindex_object(self, obj):
+        for action in self.obj_actions.pop(obj, ()):
+            objects = self.refs.get(action)
+            if objects is not None:
+                objects.discard(obj)
+                if not objects:
+                    del self.refs[action]
+
+    def _index_object(self, obj):
+        self._unindex_object(obj)
+        if obj.type != 'ARMATURE':
+            return
+        actions = get_object_actions(obj, True)
+        if actions:
+            self.obj_actions[obj] = actions
+            for action in actions:
+                self.refs[action].add(obj)
+
+    def rebuild(self):
+        "scans all the objects in the blend file"
+        self.refs.clear()
+        self.obj_actions.clear()
+        self.pending.clear()
+        for obj in bpy.data.objects:
+            self._index_object(obj)
+        self.n_objects = len(bpy.data.objects)
+        self.valid = True
+
+    def refresh(self):
+        "applies pending updates, or rebuilds the index if the incremental update is not possible"
+        if not self.valid or self.n_objects != len(bpy.data.objects):
+            self.rebuild()
+            return
+
+        while self.pending:
+            obj = self.pending.pop()
+            try:
+                self._index_object(obj)
+            except ReferenceError:
+                # it was removed meanwhile
+                self.invalidate()
+                self.rebuild()
+                return
+
+    def get_refs(self, action):
+        "returns set of armature objects which reference the action"
+        self.refresh()
+        res = set(self.refs.get(action, ()))
+        try:
+            for obj in res:
+                obj.name
+        except ReferenceError:
+            # some object was removed unnoticed
+            self.rebuild()
+            res = set(self.refs.get(action, ()))
+        return res
+
+action_ref_index = ActionRefIndex()
+
+@persistent
+def _invalidate_action_ref_index(*args):
+    action_ref_index.invalidate()
+
+@persistent
+def _update_action_ref_index(scene, depsgraph=None):
+    if not action_ref_index.valid:
+        return
+    if depsgraph is None:
+        # old blender gives no list of updates
+        if getattr(bpy.data.objects, "is_updated", True):
+            action_ref_index.invalidate()
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object):
+            action_ref_index.mark_updated(update.id.original)
+
+def get_update_handlers():
+    "returns list of handlers to track objects' changes in the current blender version"
+    if hasattr(bpy.app.handlers, "depsgraph_update_post"):
+        return bpy.app.handlers.depsgraph_update_post
+    return bpy.app.handlers.scene_update_post
 
-    if not (op.filter_absent_bones or op.filter_connected_loc or op.filter_constant_keys):
+def register_action_ref_index():
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _invalidate_action_ref_index not in handlers:
+            handlers.append(_invalidate_action_ref_index)
+    handlers = get_update_handlers()
+    if _update_action_ref_index not in handlers:
+        handlers.append(_update_action_ref_index)
+
+def unregister_action_ref_index():
+    for handlers in (bpy.app.handlers.load_post, bpy.app.handlers.undo_post, bpy.app.handlers.redo_post):
+        if _invalidate_action_ref_index in handlers:
+            handlers.remove(_invalidate_action_ref_index)
+    handlers = get_update_handlers()
+    if _update_action_ref_index in handlers:
+        handlers.remove(_update_action_ref_index)
+    action_ref_index.invalidate()
+
+
+def check_filter_options(op):
+    "returns True if the options allow to filter anything, or reports why not"
+    if not (op.filter_absent_bones or op.filter_connected_loc or op.filter_identity_channels
+            or op.filter_constant_keys or op.filter_decimate or op.quantize):
         op.report({'WARNING'}, "No filter type selected!")
-        return {'CANCELLED'}
+        return False
+
+    if (op.filter_decimate or op.verify or op.quantize) and np is None:
+        op.report({'ERROR'}, "Decimation, quantization and verification need numpy, which is not available!")
+        return False
+    return True
+
+def get_action_refs(op, context):
+    """ returns dict {action : set of referencing armature objects} for actions of the selected objects
+    and their animated datablocks (non-armature actions have no references). """
 
     sel_objects = [obj for obj in context.selected_objects if obj.type == 'ARMATURE']
 
     # get actions we are going to process
     actions_to_filter = set()
-    for obj in sel_objects:
-        actions_to_filter.update(get_object_actions(obj, op.also_nla))
-
-    op.total_actions += len(actions_to_filter)
-    if len(actions_to_filter) == 0:
-        op.report({'WARNING'}, "No action to filter found!")
-        return {'CANCELLED'}
+    for obj in context.selected_objects:
+        for _id in get_animated_ids(obj):
+            actions_to_filter.update(get_object_actions(_id, op.also_nla))
 
     # actions could be shared between objects, so we try to combine bone names from
     # all referencing rigs for an action
 
-    # look for objects to extract references
-    if op.global_search:
-        # look everywhere
-        ref_look_objects = {obj for obj in bpy.data.objects if obj.type == 'ARMATURE'}
-    else:
-        # use only selection
-        ref_look_objects = set(sel_objects)
-
-    # now we search references to these actios in ref_look_objects
+    # now we search references to these actios in the selection
     action_refs = defaultdict(set)
-    for obj in ref_look_objects:
+    for obj in sel_objects:
         for action in get_object_actions(obj, True):
             if action in actions_to_filter:
                 action_refs[action].add(obj)
+
+    if op.global_search:
+        # and everywhere (using the index instead of scanning all the objects)
+        for action in actions_to_filter:
+            action_refs[action].update(action_ref_index.get_refs(action))
+    # the rest (not bone) actions have no references
+    for action in actions_to_filter:
+        if action not in action_refs:
+            action_refs[action] = set()
     # now we have all needed actions with refs in action_refs
-    del actions_to_filter
+    return action_refs
+
+def do_filter_channels(op, context):
+
+    if not check_filter_options(op):
+        return {'CANCELLED'}
+
+    action_refs = get_action_refs(op, context)
+    op.total_actions += len(action_refs)
+    if len(action_refs) == 0:
+        op.report({'WARNING'}, "No action to filter found!")
+        return {'CANCELLED'}
+
+    return filter_actions(op, action_refs)
+
+def filter_actions(op, action_refs):
+    """ filters actions from dict {action : set of referencing armature objects}.
+    The bone filters are not applied to actions with no referencing armatures. """
+    for _ in iter_filter_actions(op, action_refs):
+        pass
+    return {'FINISHED'}
+
+def iter_filter_actions(op, action_refs):
+    """ the same as filter_actions(), but step by step: it yields (number of processed fcurves,
+    True if the action is finished) after each fcurve and after each action. """
+
+    analyses, digests = {}, {}
+    if op.analysis_jobs > 0 and action_refs:
+        # analyze all the keyframes in the worker processes first, then apply the decisions here
+        if can_analyze_in_parallel():
+            _t = time.perf_counter()
+            try:
+                analyses, digests = analyze_actions_parallel(op, list(action_refs), op.analysis_jobs)
+            except Exception as e:
+                print("parallel analysis failed, analyzing serially: {!r}".format(e))
+                analyses, digests = {}, {}
+            else:
+                print("analyzed {} fcurves in {} processes in {:.3f} sec".format(
+                      len(analyses), op.analysis_jobs, time.perf_counter() - _t))
+        else:
+            print("parallel analysis isn't available here (needs numpy, python 3.8+ and fork), analyzing serially")
 
     for action, ref_objects in action_refs.items():
 
@@ -128,6 +794,18 @@ def do_filter_channels(op, context):
             print()
         print("filtering action {} @ [{}]".format(action.name, ", ".join((o.name for o in ref_objects))))
 
+        # statistics record for the report (if needed)
+        rec = None
+        if op.report_records is not None:
+            rec = {"action" : action.name, "refs" : sorted(o.name for o in ref_objects), "status" : "filtered",
+                   "parse_time" : 0.0, "analyze_time" : 0.0, "remove_time" : 0.0, "fcurves" : []}
+            op.report_records.append(rec)
+        _t_parse = _t_analyze = _t_remove = 0.0
+        _t = time.perf_counter()
+
+        # no armature - no bones to check the channels with
+        use_bone_filters = len(ref_objects) > 0
+
         if op.filter_absent_bones:
             # find existing bones
             existing_bones = set()
@@ -140,68 +818,357 @@ def do_filter_channels(op, context):
             for _obj in ref_objects:
                 disconnected_bones.update(get_disconnected_bones(_obj))
 
+        if op.use_fingerprints and PROP_FINGERPRINT in action:
+            # was it filtered already the same way, and hasn't changed since then?
+            # (never filtered ones aren't hashed here, it would only double the reading)
+            bone_sets = (existing_bones if op.filter_absent_bones else (),
+                         disconnected_bones if op.filter_connected_loc else ())
+            if action.get(PROP_FINGERPRINT) == get_action_fingerprint(op, action, *bone_sets,
+                                                                      digests=digests.get(action)):
+                print("skipped (already filtered)")
+                op.skipped_actions += 1
+                if rec:
+                    rec["status"] = "skipped"
+                    rec["parse_time"] = time.perf_counter() - _t
+                yield len(action.fcurves), True
+                continue
+
         fcurves = action.fcurves
         fcurves_to_kill = []
         op.total_fcurves += len(fcurves)
 
+        # to check the changed fcurves, and to roll back the action if needed
+        verifier = ActionVerifier(action) if (op.verify and not op.dry_run) else None
+        _killed = op.killed_fcurves, op.killed_keyframes
+
+        _t1 = time.perf_counter()
+        _t_parse += _t1 - _t
+
         # analyze curves to be killed or filtered
-        for fc in fcurves:
+        for fc_index, fc in enumerate(fcurves):
 
-            op.total_keyframes += len(fc.keyframe_points)
+            _t = _t1
+            n_keys = len(fc.keyframe_points)
+            op.total_keyframes += n_keys
+            reason = None
+            n_keys_after = n_keys
 
             is_bone_fcurve = False
-            if (op.filter_absent_bones or op.filter_connected_loc):
+            if (use_bone_filters and (op.filter_absent_bones or op.filter_connected_loc or op.filter_identity_channels)):
                 # it's about bones, so process only bone fcurves
                 _res = REO_PATT_PARSE_DATA_PATH.search(fc.data_path)
                 if _res:
                     is_bone_fcurve = True
                     _bone_name, _channel = _res.group(1),_res.group(2)
+            _t1 = time.perf_counter()
+            _t_parse += _t1 - _t
 
             if (is_bone_fcurve and op.filter_absent_bones):
                 # check if the bone exists
                 if _bone_name not in existing_bones:
-                    fcurves_to_kill.append(fc)
-                    if op.verbose:
-                        print("to kill {} [{}] absent bone".format(fc.data_path, fc.array_index))
-                    op.killed_fcurves += 1
-                    op.killed_keyframes += len(fc.keyframe_points)
-                    continue
-
-            if (is_bone_fcurve and op.filter_connected_loc):
+                    reason = "absent bone"
+
+            if (reason is None and is_bone_fcurve and op.filter_connected_loc):
                 # is it loc of connected bone?
                 if _channel.startswith("loc"):
                     if _bone_name not in disconnected_bones:
-                        fcurves_to_kill.append(fc)
-                        if op.verbose:
-                            print("to kill {} [{}] connected".format(fc.data_path, fc.array_index))
-                        op.killed_fcurves += 1
-                        op.killed_keyframes += len(fc.keyframe_points)
-                        continue
-
-            if (op.filter_constant_keys):
-                # does it need to be truncated to the first key only?
-                if len(fc.keyframe_points) > 1 and not value_changes(fc):
-                    if op.verbose:
-                        print("to truncate {} [{}] constant".format(fc.data_path, fc.array_index))
-                    op.killed_keyframes += len(fc.keyframe_points) - 1
-                    if not op.dry_run:
-                        # actual truncate
-                        # paranoid?
-                        if not fcurve_is_sorted(fc):
-                            fc.update()
-                        kfp = fc.keyframe_points
-                        i = len(kfp)
-                        while (i > 1):
-                            i -= 1
-                            kfp.remove(kfp[i], fast=True)
+                        reason = "connected"
+
+            if (reason is None and is_bone_fcurve and op.filter_identity_channels and n_keys > 0):
+                # is it constant at the rest pose value?
+                _defaults = POSE_CHANNEL_DEFAULTS.get(_channel)
+                if (_defaults and fc.array_index < len(_defaults) and len(fc.modifiers) == 0
+                        and abs(fc.keyframe_points[0].co[1] - _defaults[fc.array_index]) < EPSILON
+                        and not value_changes(fc)):
+                    reason = "identity"
+
+            if reason:
+                fcurves_to_kill.append(fc)
+                if op.verbose:
+                    print("to kill {} [{}] {}".format(fc.data_path, fc.array_index, reason))
+                op.killed_fcurves += 1
+                op.killed_keyframes += n_keys
+                n_keys_after = 0
+
+            # the keyframe filters' decisions, made here or by the worker processes beforehand
+            info = None
+            if (reason is None and n_keys > 0 and (op.quantize or n_keys > 1 and (op.filter_constant_keys or op.filter_decimate))):
+                info = analyses.get((action, fc_index)) if analyses else None
+                if info is None:
+                    info = analyze_fcurve(op, fc)
+                _t = time.perf_counter()
+                _t_analyze += _t - _t1
+                _t1 = _t
+
+            quantized = False
+            if info and info["quantize_keep"] is not None:
+                # snap values to the grid, and remove the keys which became duplicates
+                keep = info["quantize_keep"]
+                _grid = get_quantize_grid(op, fc.data_path)
+                quantized = True
+                if op.verbose:
+                    print("to quantize {} [{}] by {} {} -> {} keys".format(fc.data_path, fc.array_index, _grid, n_keys, len(keep)))
+                op.killed_keyframes += n_keys - len(keep)
+                n_keys_after = len(keep)
+                if not op.dry_run:
+                    if verifier:
+                        verifier.add(fc)
+                    if not info["is_sorted"]:
+                        fc.update()
+                    data = read_keyframes(fc)
+                    for name in KEYFRAME_VECTOR_PROPS:
+                        data[name][1::2] = quantize_values(data[name][1::2], _grid)
+                    write_keyframes(fc, data, keep)
+                _t1 = time.perf_counter()
+                _t_remove += _t1 - _t
+
+            if info and info["constant"]:
+                # it needs to be truncated to the first key only
+                reason = "constant"
+                if op.verbose:
+                    print("to truncate {} [{}] constant".format(fc.data_path, fc.array_index))
+                op.killed_keyframes += n_keys_after - 1
+                n_keys_after = 1
+                _t = time.perf_counter()
+                if not op.dry_run:
+                    if verifier:
+                        verifier.add(fc)
+                    # actual truncate
+                    # paranoid?
+                    if not info["is_sorted"] and not quantized:
                         fc.update()
+                    _t1 = time.perf_counter()
+                    # (only the benchmark sets legacy_truncate, to compare the timing)
+                    truncate_keyframes(fc, getattr(op, "legacy_truncate", False))
+                    op.truncate_time += time.perf_counter() - _t1
+                _t1 = time.perf_counter()
+                _t_remove += _t1 - _t
+
+            if info and info["decimate_keep"] is not None:
+                # some keyframes can be restored from their neighbours
+                keep = info["decimate_keep"]
+                reason = "decimated"
+                if op.verbose:
+                    print("to decimate {} [{}] {} -> {} keys".format(fc.data_path, fc.array_index, n_keys_after, len(keep)))
+                op.killed_keyframes += n_keys_after - len(keep)
+                n_keys_after = len(keep)
+                _t = time.perf_counter()
+                if not op.dry_run:
+                    if verifier:
+                        verifier.add(fc)
+                    if not info["is_sorted"] and not quantized:
+                        fc.update()
+                    write_keyframes(fc, read_keyframes(fc), keep, update=False)
+                    linearize_decimated_spans(fc, keep)
+                _t1 = time.perf_counter()
+                _t_remove += _t1 - _t
+
+            if rec:
+                if quantized:
+                    reason = "quantized, " + reason if reason else "quantized"
+                rec["fcurves"].append({"data_path" : fc.data_path, "array_index" : fc.array_index,
+                                       "keys_before" : n_keys, "keys_after" : n_keys_after, "reason" : reason or ""})
+            _t = time.perf_counter()
+            _t_analyze += _t - _t1
+            yield 1, False
+            _t1 = time.perf_counter()
+
+        if verifier and verifier.fcurves:
+            # compare the changed fcurves with the original ones
+            max_err, rms_err = verifier.get_errors()
+            failed = max_err > op.verify_tolerance
+            for fc, _max, _rms, _failed in zip(verifier.fcurves, max_err, rms_err, failed):
+                if op.verbose or _failed:
+                    print("{} {} [{}] max error {:.6g}, RMS error {:.6g}".format(
+                        "FAILED" if _failed else "verified", fc.data_path, fc.array_index, _max, _rms))
+            if failed.any():
+                print("action {} is rolled back: {} channel(s) exceed the error limit {}".format(
+                    action.name, failed.sum(), op.verify_tolerance))
+                verifier.rollback()
+                op.killed_fcurves, op.killed_keyframes = _killed
+                op.rolled_back_actions += 1
+                if rec:
+                    rec["status"] = "rolled back"
+                    for fc_rec in rec["fcurves"]:
+                        fc_rec["keys_after"] = fc_rec["keys_before"]
+                    rec["parse_time"], rec["analyze_time"] = _t_parse, _t_analyze
+                    rec["remove_time"] = _t_remove + time.perf_counter() - _t1
+                yield 0, True
+                continue
 
         # kill fcurves
         if (not op.dry_run and len(fcurves_to_kill) > 0):
-            while(fcurves_to_kill):
-                fc = fcurves_to_kill.pop()
-                fcurves.remove(fc)
+            remove_fcurves(action, fcurves_to_kill)
+
+        if op.use_fingerprints and not op.dry_run:
+            # the result, to be recognized next time
+            action[PROP_FINGERPRINT] = get_action_fingerprint(op, action, *bone_sets)
+        _t_remove += time.perf_counter() - _t1
+
+        if rec:
+            rec["parse_time"], rec["analyze_time"], rec["remove_time"] = _t_parse, _t_analyze, _t_remove
+        yield 0, True
+
+
+def reset_statistics(op):
+    "sets the operation statistics counters to zero"
+    op.total_actions = 0
+    op.total_fcurves = 0
+    op.total_keyframes = 0
+    op.killed_fcurves = 0
+    op.killed_keyframes = 0
+    op.truncate_time = 0.0
+    op.rolled_back_actions = 0
+    op.skipped_actions = 0
+    # per action / per fcurve records for the report file
+    op.report_records = [] if op.report_path else None
+
+def get_statistics_message(op):
+    "returns the operation statistics as a one line report"
+    s = "{} of {} keyframes ({:.2f}%), {} of {} fcurves {} killed in {} actions".format(
+        op.killed_keyframes, op.total_keyframes,
+        (0  if op.total_keyframes == 0 else op.killed_keyframes / op.total_keyframes * 100),
+        op.killed_fcurves, op.total_fcurves,
+        "gotta be" if op.dry_run else "were",
+        op.total_actions
+        )
+    if not op.dry_run and op.filter_constant_keys:
+        s += ", truncation took {:.3f}s".format(op.truncate_time)
+    if not op.dry_run and op.verify:
+        s += ", {} actions rolled back".format(op.rolled_back_actions)
+    if op.use_fingerprints:
+        s += ", {} actions skipped as already filtered".format(op.skipped_actions)
+    return s
+
+
+# columns of the csv report (action fields, then fcurve fields)
+REPORT_CSV_COLUMNS = ("action", "status", "parse_time", "analyze_time", "remove_time",
+                      "data_path", "array_index", "keys_before", "keys_after", "reason")
+
+def write_report(op, filepath):
+    "writes the per action and per fcurve statistics to .csv or .json (otherwise) file"
+    import json
+    filepath = bpy.path.abspath(filepath)
+    if filepath.lower().endswith(".csv"):
+        import csv
+        with open(filepath, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(REPORT_CSV_COLUMNS)
+            for rec in op.report_records:
+                row = [rec[name] for name in REPORT_CSV_COLUMNS[:5]]
+                if not rec["fcurves"]:
+                    writer.writerow(row + [""] * 5)
+                for fc_rec in rec["fcurves"]:
+                    writer.writerow(row + [fc_rec[name] for name in REPORT_CSV_COLUMNS[5:]])
+    else:
+        totals = {name : getattr(op, name) for name in ("total_actions", "total_fcurves", "total_keyframes",
+                  "killed_fcurves", "killed_keyframes", "rolled_back_actions", "skipped_actions")}
+        res = {
+            "version" : bl_info["version"],
+            "options" : {name : getattr(op, name) for name in FINGERPRINT_OPTIONS + ("dry_run",)},
+            "totals" : totals,
+            "actions" : op.report_records,
+            }
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(res, f, indent=1)
+    print("report is written to {}".format(filepath))
+
+
+def get_rna_values(struct):
+    """ returns tuple of (name, value) of all RNA properties of the struct, with arrays as tuples and
+    collections (e.g. envelope control points) as tuples of their items' values. Pointers are skipped. """
+    values = []
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type == 'POINTER':
+            continue
+        value = getattr(struct, prop.identifier)
+        if prop.type == 'COLLECTION':
+            value = tuple(get_rna_values(item) for item in value)
+        elif getattr(prop, "is_array", False) or getattr(prop, "array_length", 0) > 0:
+            value = tuple(value)
+        values.append((prop.identifier, value))
+    return tuple(values)
+
+def get_action_content_hash(action):
+    """ returns hex digest of the action's content: fcurves' data paths, all keyframes' properties
+    (which are read in bulk), mute flags, F-modifiers' settings, pose markers and the manual frame range
+    (blender 3.1+). The order of fcurves doesn't matter. """
+    fc_digests = []
+    for fc in action.fcurves:
+        h = hashlib.sha1(repr((fc.data_path, fc.array_index, fc.extrapolation, fc.mute,
+                               len(fc.keyframe_points))).encode())
+        # modifiers (e.g. Noise, Generator) make the animation too, even of fcurves without keys
+        for mod in fc.modifiers:
+            h.update(repr((mod.type, get_rna_values(mod))).encode())
+        data = read_keyframes(fc)
+        for name in sorted(data):
+            h.update(data[name].tobytes())
+        fc_digests.append(h.digest())
+    fc_digests.sort()
+    # the manual frame range (and its cycling) changes how the action plays
+    frame_range = None
+    if getattr(action, "use_frame_range", False):
+        frame_range = (action.frame_start, action.frame_end, action.use_cyclic)
+    h = hashlib.sha1(repr((getattr(action, "id_root", ""), frame_range,
+                           sorted((m.name, m.frame) for m in getattr(action, "pose_markers", ())))).encode())
+    for digest in fc_digests:
+        h.update(digest)
+    return h.hexdigest()
+
+def find_duplicate_actions(actions):
+    "returns list of lists of identical actions (only groups of two and more)"
+    groups = defaultdict(list)
+    for action in actions:
+        groups[get_action_content_hash(action)].append(action)
+    return [group for group in groups.values() if len(group) > 1]
+
+def remap_action_users(old_action, new_action):
+    "makes all users of old_action (including NLA strips) use new_action"
+    if hasattr(old_action, "user_remap"):
+        old_action.user_remap(new_action)
+        return
 
+    # old blender: we know only about objects' animation data
+    for obj in bpy.data.objects:
+        ad = obj.animation_data
+        if not ad:
+            continue
+        if ad.action == old_action:
+            ad.action = new_action
+        for track in ad.nla_tracks:
+            for strip in track.strips:
+                if strip.action == old_action:
+                    strip.action = new_action
+
+def do_merge_duplicate_actions(op, context):
+
+    if np is None:
+        op.report({'ERROR'}, "Duplicate search needs numpy, which is not available!")
+        return {'CANCELLED'}
+
+    # linked actions cannot be remapped or deleted here
+    groups = find_duplicate_actions([action for action in bpy.data.actions if not action.library])
+    n_merged = n_deleted = 0
+    for group in groups:
+        # the most used one (or the first by name) stays
+        group.sort(key=lambda a: (-a.users, a.name))
+        canonical = group[0]
+        print("action {} has duplicates: {}".format(canonical.name, ", ".join(a.name for a in group[1:])))
+        for dup in group[1:]:
+            n_merged += 1
+            if op.dry_run:
+                continue
+            remap_action_users(dup, canonical)
+            if op.delete_duplicates:
+                if op.verbose:
+                    print("deleting {}".format(dup.name))
+                bpy.data.actions.remove(dup)
+                n_deleted += 1
+
+    s = "{} duplicates of {} actions {} merged".format(n_merged, len(groups), "gotta be" if op.dry_run else "were")
+    if op.delete_duplicates and not op.dry_run:
+        s += ", {} deleted".format(n_deleted)
+    op.report({'INFO'}, s)
     return {'FINISHED'}
 
 
@@ -226,11 +1193,8 @@ def make_annotations(cls):
     return cls
 
 @make_annotations
-class FilterActionChannels(bpy.types.Operator):
-    """Removes unnecessary keyframes and fcurves from actions of the selected armatures."""
-    bl_idname = "object.filter_action_channels"
-    bl_label = "Filter action(s) channels"
-    bl_options = {'REGISTER', 'UNDO'}
+class FilterActionChannelsProperties:
+    "the filter options (mix-in for the filter operators)"
 
     filter_constant_keys = BoolProperty(
             name="Filter constant keys",
@@ -238,6 +1202,56 @@ class FilterActionChannels(bpy.types.Operator):
             default=True
         )
 
+    filter_decimate = BoolProperty(
+            name="Filter by tolerance (decimate)",
+            description="Remove keyframes which the remaining ones reproduce within the tolerance (lossy).",
+            default=False
+        )
+
+    decimate_tolerance = FloatProperty(
+            name="Decimate tolerance",
+            description="Maximum allowed error of the channel's value at removed keyframes.",
+            default=0.001,
+            min=0.0,
+            precision=6
+        )
+
+    filter_identity_channels = BoolProperty(
+            name="Filter rest pose channels",
+            description="Remove bone transform channels which stay at the rest pose value (could be dangerous, the pose bone keeps its current value then).",
+            default=False
+        )
+
+    quantize = BoolProperty(
+            name="Quantize values",
+            description="Snap keyframe values and handles of transform channels to the grid, and remove the keys which became duplicates (lossy).",
+            default=False
+        )
+
+    quantize_location = FloatProperty(
+            name="Location grid",
+            description="Quantization step for location channels (0 - don't quantize).",
+            default=0.0001,
+            min=0.0,
+            precision=6
+        )
+
+    quantize_rotation = FloatProperty(
+            name="Rotation grid",
+            description="Quantization step for rotation channels (radians, quaternion or axis-angle units; 0 - don't quantize).",
+            default=0.0001,
+            min=0.0,
+            precision=6
+        )
+
+    quantize_scale = FloatProperty(
+            name="Scale grid",
+            description="Quantization step for scale channels (0 - don't quantize).",
+            default=0.0001,
+            min=0.0,
+            precision=6
+        )
+
     filter_absent_bones = BoolProperty(
             name="Filter absent bones",
             description="Remove channels with no corresponding pose bones in the object (could be dangerous if the action is shared with other objects).",
@@ -268,56 +1282,358 @@ class FilterActionChannels(bpy.types.Operator):
             default=False
         )
 
+    verify = BoolProperty(
+            name="Verify",
+            description="Compare the changed channels with the original ones, and roll back the actions which differ more than the limit.",
+            default=False
+        )
+
+    verify_tolerance = FloatProperty(
+            name="Verify error limit",
+            description="Maximum allowed difference of the channel's value at any frame of the action.",
+            default=0.001,
+            min=0.0,
+            precision=6
+        )
+
+    use_fingerprints = BoolProperty(
+            name="Skip filtered actions",
+            description="Skip actions which were filtered with the same options and haven't changed since then (stores a custom property in each filtered action).",
+            default=False
+        )
+
+    report_path = StringProperty(
+            name="Report file",
+            description="Write per action and per fcurve statistics to this .json or .csv file (nothing if empty).",
+            default="",
+            subtype='FILE_PATH'
+        )
+
+    analysis_jobs = IntProperty(
+            name="Analysis processes",
+            description="Analyze keyframes in this many worker processes (0 - in blender itself; needs numpy, python 3.8+ and fork).",
+            default=0,
+            min=0,
+            max=64
+        )
+
     verbose = BoolProperty(
             name="Verbose",
             description="Show detailed log in the console.",
             default=False
         )
 
+class FilterActionChannels(FilterActionChannelsProperties, bpy.types.Operator):
+    """Removes unnecessary keyframes and fcurves from actions of the selected objects (bone filters - of armatures only)."""
+    bl_idname = "object.filter_action_channels"
+    bl_label = "Filter action(s) channels"
+    bl_options = {'REGISTER', 'UNDO'}
+
     @classmethod
     def poll(cls, context):
-        return len(context.selected_objects) > 0 and any(map(lambda obj: obj.type == 'ARMATURE', context.selected_objects))
+        return len(context.selected_objects) > 0
 
     def invoke(self, context, event):
         return context.window_manager.invoke_props_dialog(self)
 
     def execute(self, context):
-        # statistics
-        self.total_actions = 0
-        self.total_fcurves = 0
-        self.total_keyframes = 0
-        self.killed_fcurves = 0
-        self.killed_keyframes = 0
+        reset_statistics(self)
 
         op_res = do_filter_channels(self, context)
 
         if 'FINISHED' in op_res:
-            s = "{} of {} keyframes ({:.2f}%), {} of {} fcurves {} killed in {} actions".format(
-                self.killed_keyframes, self.total_keyframes,
-                (0  if self.total_keyframes == 0 else self.killed_keyframes / self.total_keyframes * 100),
-                self.killed_fcurves, self.total_fcurves,
-                "gotta be" if self.dry_run else "were",
-                self.total_actions
-                )
-            self.report({'INFO'}, s)
+            self.report({'INFO'}, get_statistics_message(self))
+            if self.report_path:
+                write_report(self, self.report_path)
 
         return op_res
 
 
+# seconds of work per timer event of the modal filter
+MODAL_TIME_SLICE = 0.1
+
+# events passed through while the modal filter runs: view navigation only, anything editing
+# the data (or undo) between the steps would pull it from under the filter
+MODAL_PASS_THROUGH_EVENTS = {'MOUSEMOVE', 'INBETWEEN_MOUSEMOVE', 'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE',
+                             'WHEELINMOUSE', 'WHEELOUTMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM', 'MOUSEROTATE',
+                             'NDOF_MOTION', 'TIMER_REPORT', 'TIMERREGION', 'WINDOW_DEACTIVATE'}
+
+# the running modal filters, to abort them if the data is going to be replaced
+running_modal_filters = []
+
+@persistent
+def _abort_modal_filters(*args):
+    for op in running_modal_filters:
+        op._aborted = True
+    del running_modal_filters[:]
+
+def register_modal_abort():
+    for handlers in (bpy.app.handlers.load_pre, bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre):
+        if _abort_modal_filters not in handlers:
+            handlers.append(_abort_modal_filters)
+
+def unregister_modal_abort():
+    for handlers in (bpy.app.handlers.load_pre, bpy.app.handlers.undo_pre, bpy.app.handlers.redo_pre):
+        if _abort_modal_filters in handlers:
+            handlers.remove(_abort_modal_filters)
+
+class FilterActionChannelsModal(FilterActionChannelsProperties, bpy.types.Operator):
+    """Filters actions of the selected objects in the background with progress. Esc stops it after the current action."""
+    bl_idname = "object.filter_action_channels_modal"
+    bl_label = "Filter action(s) channels (modal)"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    @classmethod
+    def poll(cls, context):
+        return FilterActionChannels.poll(context)
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        reset_statistics(self)
+        if not check_filter_options(self):
+            return {'CANCELLED'}
+
+        action_refs = get_action_refs(self, context)
+        self.total_actions += len(action_refs)
+        if len(action_refs) == 0:
+            self.report({'WARNING'}, "No action to filter found!")
+            return {'CANCELLED'}
+
+        self._steps = iter_filter_actions(self, action_refs)
+        self._n_fcurves = sum(len(action.fcurves) for action in action_refs)
+        self._n_done = 0
+        self._n_actions_done = 0
+        self._stopping = False
+        self._aborted = False
+        running_modal_filters.append(self)
+
+        wm = context.window_manager
+        if bpy.app.version < (2, 80, 0):
+            self._timer = wm.event_timer_add(0.01, context.window)
+        else:
+            self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.progress_begin(0, max(1, self._n_fcurves))
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if self._aborted:
+            # the actions may be gone, never resume on them
+            return self.finish(context)
+
+        if event.type == 'ESC':
+            # it will stop when the current action is finished
+            self._stopping = True
+            return {'RUNNING_MODAL'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'} if event.type in MODAL_PASS_THROUGH_EVENTS else {'RUNNING_MODAL'}
+
+        deadline = time.perf_counter() + MODAL_TIME_SLICE
+        finished = True
+        for n_done, action_done in self._steps:
+            self._n_done += n_done
+            if action_done:
+                self._n_actions_done += 1
+                if self._stopping:
+                    break
+            if time.perf_counter() > deadline:
+                finished = False
+                break
+
+        if finished:
+            return self.finish(context)
+
+        context.window_manager.progress_update(self._n_done)
+        return {'RUNNING_MODAL'}
+
+    def cancel(self, context):
+        self.finish(context)
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        self._steps = None
+        if self in running_modal_filters:
+            running_modal_filters.remove(self)
+        s = get_statistics_message(self)
+        if self._aborted:
+            self.report({'WARNING'}, "Aborted after {} of {} actions by file load or undo: {}".format(
+                        self._n_actions_done, self.total_actions, s))
+            return {'CANCELLED'}
+        if self._stopping:
+            s = "Stopped after {} of {} actions: {}".format(self._n_actions_done, self.total_actions, s)
+        self.report({'INFO'}, s)
+        if self.report_path:
+            write_report(self, self.report_path)
+        # the finished actions are changed anyway, so it's not 'CANCELLED' (for undo)
+        return {'FINISHED'}
+
+
+@make_annotations
+class MergeDuplicateActions(bpy.types.Operator):
+    """Finds identical actions, and makes all their users (NLA strips too) use one of them."""
+    bl_idname = "object.merge_duplicate_actions"
+    bl_label = "Merge duplicate actions"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    delete_duplicates = BoolProperty(
+            name="Delete duplicates",
+            description="Delete the merged duplicates (otherwise they are left with no users, but a fake user, if they had it).",
+            default=False
+        )
+
+    dry_run = BoolProperty(
+            name="Dry run",
+            description="No actual merging, but showing statistics.",
+            default=False
+        )
+
+    verbose = BoolProperty(
+            name="Verbose",
+            description="Show detailed log in the console.",
+            default=False
+        )
+
+    @classmethod
+    def poll(cls, context):
+        return len(bpy.data.actions) > 1
+
+    def invoke(self, context, event):
+        return context.window_manager.invoke_props_dialog(self)
+
+    def execute(self, context):
+        return do_merge_duplicate_actions(self, context)
+
+
+def get_operator_options(cls):
+    "yields (name, property function, keywords) of the operator (or mix-in) class properties"
+    props = dict(cls.__dict__)
+    props.update(cls.__dict__.get("__annotations__", {}))
+    for name, prop in props.items():
+        if isinstance(prop, tuple) and len(prop) == 2 and callable(prop[0]):
+            # blender < 2.93
+            yield name, prop[0], prop[1]
+        elif hasattr(prop, "function") and hasattr(prop, "keywords"):
+            yield name, prop.function, prop.keywords
+
+class FilterSession:
+    "operator-like holder of the filter options and statistics for headless runs"
+
+    def __init__(self, **options):
+        for name, _, keywords in get_operator_options(FilterActionChannelsProperties):
+            setattr(self, name, keywords.get("default"))
+        for name, value in options.items():
+            setattr(self, name, value)
+        reset_statistics(self)
+
+    def report(self, type, message):
+        print("{}: {}".format(", ".join(sorted(type)), message))
+
+# headless run prints its result as a json line with this prefix
+CLI_RESULT_PREFIX = "FILTER_ACTION_CHANNELS_RESULT "
+
+# the options whose defaults differ in headless runs: libraries are re-filtered in batches there
+CLI_DEFAULTS = {"use_fingerprints" : True}
+
+def make_cli_parser():
+    "returns argparse parser with the operator's options as command line flags"
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog="blender -b file.blend --python filter_action_channels.py --",
+        description="Filters channels of all actions in the blend file.")
+    for name, func, keywords in sorted(get_operator_options(FilterActionChannelsProperties)):
+        flag = "--" + name.replace("_", "-")
+        descr = keywords.get("description", "")
+        if name in CLI_DEFAULTS:
+            keywords = dict(keywords, default=CLI_DEFAULTS[name])
+        if func is BoolProperty:
+            parser.add_argument(flag, dest=name, action="store_true", help=descr)
+            parser.add_argument("--no-" + flag[2:], dest=name, action="store_false",
+                                help="(default)" if not keywords.get("default") else None)
+            parser.set_defaults(**{name : keywords.get("default", False)})
+        elif func is FloatProperty:
+            parser.add_argument(flag, dest=name, type=float, default=keywords.get("default", 0.0),
+                                help="{} (default {})".format(descr, keywords.get("default", 0.0)))
+        elif func is IntProperty:
+            parser.add_argument(flag, dest=name, type=int, default=keywords.get("default", 0),
+                                help="{} (default {})".format(descr, keywords.get("default", 0)))
+        elif func is StringProperty:
+            parser.add_argument(flag, dest=name, default=keywords.get("default", ""), help=descr)
+    parser.add_argument("--save", action="store_true", help="Save the blend file in place.")
+    parser.add_argument("--save-as", metavar="PATH", help="Save the blend file to the given path.")
+    return parser
+
+def main_cli(argv):
+    "entry point for 'blender -b file.blend --python filter_action_channels.py -- [options]'"
+    import json
+    args = make_cli_parser().parse_args(argv)
+    options = vars(args)
+    save, save_as = options.pop("save"), options.pop("save_as")
+    op = FilterSession(**options)
+
+    res = {"file" : bpy.data.filepath, "status" : "CANCELLED", "saved" : None}
+    _t = time.perf_counter()
+    if check_filter_options(op):
+        # every local action in the file, with all its references (linked ones can't be saved back
+        # into their libraries)
+        action_refs = {action : action_ref_index.get_refs(action) for action in bpy.data.actions
+                       if not action.library}
+        res["linked_actions"] = len(bpy.data.actions) - len(action_refs)
+        op.total_actions += len(action_refs)
+        res["status"] = "".join(filter_actions(op, action_refs))
+        print(get_statistics_message(op))
+        if op.report_path:
+            write_report(op, op.report_path)
+    res["time"] = time.perf_counter() - _t
+
+    if res["status"] == 'FINISHED' and not op.dry_run and (save or save_as):
+        if save_as:
+            bpy.ops.wm.save_as_mainfile(filepath=save_as)
+        else:
+            bpy.ops.wm.save_mainfile()
+        res["saved"] = bpy.data.filepath
+
+    for name in ("total_actions", "total_fcurves", "total_keyframes", "killed_fcurves",
+                 "killed_keyframes", "rolled_back_actions", "skipped_actions"):
+        res[name] = getattr(op, name)
+    print(CLI_RESULT_PREFIX + json.dumps(res))
+    return 0 if res["status"] == 'FINISHED' else 1
+
+
 def menu_func(self, context):
     self.layout.operator_context = 'INVOKE_DEFAULT';
     self.layout.operator(
         FilterActionChannels.bl_idname)
+    self.layout.operator(
+        FilterActionChannelsModal.bl_idname)
+    self.layout.operator(
+        MergeDuplicateActions.bl_idname)
 
 def register():
     bpy.utils.register_class(FilterActionChannels)
+    bpy.utils.register_class(FilterActionChannelsModal)
+    bpy.utils.register_class(MergeDuplicateActions)
     bpy.types.VIEW3D_MT_object_animation.append(menu_func)
+    register_action_ref_index()
+    register_modal_abort()
 
 def unregister():
+    unregister_modal_abort()
+    unregister_action_ref_index()
     bpy.types.VIEW3D_MT_object_animation.remove(menu_func)
+    bpy.utils.unregister_class(MergeDuplicateActions)
+    bpy.utils.unregister_class(FilterActionChannelsModal)
     bpy.utils.unregister_class(FilterActionChannels)
 
-if __name__ == "__main__":
+if __name__ == "__main__" and bpy.app.background and "--" in sys.argv:
+    # headless run: blender -b file.blend --python filter_action_channels.py -- [options]
+    sys.exit(main_cli(sys.argv[sys.argv.index("--") + 1:]))
+
+elif __name__ == "__main__":
     try:
         unregister()
     except:
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Runs filter_action_channels.py over a directory of .blend files in a pool of background blender
+processes, and prints a json line with each file result as soon as the file is done.
+
+usage:
+    python filter_action_channels_batch.py [--blender PATH] [--jobs N] [--output-dir DIR]
+        [--recursive] DIRECTORY -- [filter options]
+
+The filter options are the same as of the operator (see 'blender -b --python
+filter_action_channels.py -- --help'). Without --output-dir the files are saved in place.
+
+@author: (c) LVII-LIX A.S. Mechanic.Kharkiv
+@last_edit: 2026-10-17
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+FILTER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "filter_action_channels.py")
+
+# must be the same as CLI_RESULT_PREFIX in filter_action_channels.py
+CLI_RESULT_PREFIX = "FILTER_ACTION_CHANNELS_RESULT "
+
+
+def find_blend_files(directory, recursive):
+    "returns sorted list of .blend files in the directory"
+    res = []
+    for root, dirs, files in os.walk(directory):
+        res.extend(os.path.join(root, name) for name in files if name.lower().endswith(".blend"))
+        if not recursive:
+            break
+    return sorted(res)
+
+def filter_file(blender, path, out_path, filter_args):
+    "runs the filter on one file in a background blender, returns the result dict"
+    cmd = [blender, "-b", path, "--python", FILTER_SCRIPT, "--"] + list(filter_args)
+    if out_path:
+        cmd += ["--save-as", out_path]
+    else:
+        cmd += ["--save"]
+
+    proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                          universal_newlines=True, errors="replace")
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith(CLI_RESULT_PREFIX):
+            res = json.loads(line[len(CLI_RESULT_PREFIX):])
+            break
+    else:
+        # it crashed, or the script failed before printing the result
+        res = {"file" : path, "status" : "ERROR", "saved" : None,
+               "error" : (proc.stderr or proc.stdout).strip().splitlines()[-10:]}
+    res["file"] = path
+    res["returncode"] = proc.returncode
+    return res
+
+def main(argv):
+    if "--" in argv:
+        i = argv.index("--")
+        argv, filter_args = argv[:i], argv[i + 1:]
+    else:
+        filter_args = []
+
+    parser = argparse.ArgumentParser(description="Filters action channels in all .blend files of the directory.")
+    parser.add_argument("directory", help="Directory with .blend files.")
+    parser.add_argument("--blender", default="blender", help="Blender executable (default 'blender').")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Number of blender processes.")
+    parser.add_argument("--output-dir", help="Save the filtered files here, instead of in place.")
+    parser.add_argument("--recursive", action="store_true", help="Look for files in sub-directories too.")
+    args = parser.parse_args(argv)
+
+    files = find_blend_files(args.directory, args.recursive)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    def get_out_path(path):
+        if not args.output_dir:
+            return None
+        out_path = os.path.join(args.output_dir, os.path.relpath(path, args.directory))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        return out_path
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(filter_file, args.blender, path, get_out_path(path), filter_args)
+                   for path in files]
+        for future in as_completed(futures):
+            res = future.result()
+            if res["status"] != 'FINISHED':
+                failed += 1
+            print(json.dumps(res), flush=True)
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))